@@ -0,0 +1,576 @@
+"""
+Tokenizer-only quantum analysis of solution text.
+
+QuantumStateAnalyzer owns everything the quantum scoring needs (tokenizer, state dimension,
+Hamiltonian, evolution time and the evolved-state cache) and nothing of the language model,
+so existing solution transcripts can be scored offline without loading model weights.
+It also accepts raw token ids, in which case no tokenizer is needed at all.
+GeneralQuantumSolver delegates its analysis methods to an analyzer.
+
+Score transcript files from the command line, one JSON line per file:
+
+    python analysis.py --tokenizer unsloth/Meta-Llama-3.1-8B-Instruct quantum_resoning.md
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import (Any, Callable, Deque, Dict, List, MutableSequence, Optional, Sequence, Tuple,
+                    Union)
+
+import numpy as np
+
+from perf import count, timed
+from quantum_ops import (ArrayCache, BlockFidelity, EvolutionEngine, HamiltonianFamily,
+                         block_fidelity, encode_token_batch, get_evolution_engine,
+                         make_hamiltonian)
+
+
+_STEP_PATTERN = re.compile(r'Step \d+[:.]\s+')
+_LEADING_STEP_PATTERN = re.compile(r'\s*Step \d+[:.](?=\s|$)')
+_MATH_SYMBOL_PATTERN = re.compile(r'[+\-*/^√∑∏∫∂θπ=≠≤≥∈∉⊆⊂∪∩]')
+_EQUATION_PATTERN = re.compile(r'[^=]=[^=]')
+_VARIABLE_PATTERN = re.compile(r'[a-zA-Z]')
+_NUMBER_PATTERN = re.compile(r'-?\d*\.?\d+')
+_MATH_TERM_PATTERN = re.compile(r'[α-ω\+\-\*/\^\{\}\[\]]+')
+
+
+def step_complexity(step: str) -> float:
+    """Score the mathematical complexity of a solution step in [0.1, 1.0]."""
+    # Count mathematical symbols and expressions
+    math_symbols = len(_MATH_SYMBOL_PATTERN.findall(step))
+    equations = len(_EQUATION_PATTERN.findall(step))
+    variables = len(set(_VARIABLE_PATTERN.findall(step)))
+
+    # Weight different components
+    complexity = (math_symbols * 0.4 + equations * 0.4 + variables * 0.2) / 100
+    return min(max(complexity, 0.1), 1.0)
+
+
+def reflected_step(completion: str) -> str:
+    """
+    The step text at the start of a reflection completion.
+
+    Reflection prompts end with "Step N: ", so the completion continues that one step.
+    Everything from the next step marker on (further steps the model went on to write) is
+    cut off; a marker at the very start, where the model restated "Step N:", is skipped.
+    Returns "" when no step text is left.
+    """
+    leading = _LEADING_STEP_PATTERN.match(completion)
+    text = completion[leading.end():] if leading else completion
+    return _STEP_PATTERN.split(text, maxsplit=1)[0].strip()
+
+
+def extract_key_elements(solution: str) -> frozenset:
+    """Numerical values and key mathematical terms of a solution, as compared for stability."""
+    return frozenset(_NUMBER_PATTERN.findall(solution)).union(_MATH_TERM_PATTERN.findall(solution))
+
+
+class StabilityTracker:
+    """
+    Incremental solution stability check over a sliding window.
+
+    Each solution's key elements are extracted once, when it arrives, and its change ratio
+    against the previous solution (|E_new ^ E_prev| / |E_new|) is computed once, so an
+    update costs O(new solution) whatever the window size. After more than ``window``
+    updates, the solution is stable when every ratio within the last ``window`` solutions
+    is below ``threshold``.
+    """
+
+    def __init__(self, window: int = 3, threshold: float = 0.001,
+                 key_elements: Callable[[str], frozenset] = extract_key_elements):
+        self.window = window
+        self.threshold = threshold
+        self.key_elements = key_elements
+        self.solutions: Deque[str] = deque(maxlen=window)
+        self._ratios: Deque[float] = deque(maxlen=max(window - 1, 0))
+        self._previous_elements: Optional[frozenset] = None
+        self._updates = 0
+
+    def __len__(self) -> int:
+        return len(self.solutions)
+
+    @property
+    def ready(self) -> bool:
+        """True once more than ``window`` solutions have been seen, so updates can be stable."""
+        return self._updates > self.window
+
+    def update(self, solution: str) -> bool:
+        """Add the newest solution and return whether the window has stabilized."""
+        elements = self.key_elements(solution)
+        if self._previous_elements is not None:
+            changed = len(elements.symmetric_difference(self._previous_elements))
+            self._ratios.append(changed / max(len(elements), 1))
+        self._previous_elements = elements
+        self.solutions.append(solution)
+        self._updates += 1
+        if not self.ready:
+            return False
+        return all(ratio < self.threshold for ratio in self._ratios)
+
+    def clear(self) -> None:
+        self.solutions.clear()
+        self._ratios.clear()
+        self._previous_elements = None
+        self._updates = 0
+
+
+@dataclass
+class AcceptancePolicy:
+    """
+    Decides whether a reflected step replaces the current one.
+
+    An improvement is accepted when it is not empty, the fidelity between its quantum
+    state and the current step's is at least ``min_fidelity``, and it keeps at least
+    ``min_complexity_ratio`` of the current step's complexity score. Subclass and
+    override ``accept`` for other criteria.
+
+    Fidelities are never negative, so with the default ``min_fidelity`` of 0.0 the
+    fidelity check accepts everything: only the empty and complexity checks apply until
+    a threshold is set.
+    """
+    min_fidelity: float = 0.0
+    min_complexity_ratio: float = 0.5
+
+    def accept(self, current_step: str, improved_step: str, fidelity: float) -> bool:
+        """
+        Args:
+            current_step: Step text the reflection was asked to improve
+            improved_step: Reflected step text
+            fidelity: Fidelity between the quantum states of the two texts
+
+        Returns:
+            True if improved_step should replace current_step
+        """
+        if not improved_step.strip():
+            return False
+        if fidelity < self.min_fidelity:
+            return False
+        minimum = self.min_complexity_ratio * step_complexity(current_step)
+        return step_complexity(improved_step) >= minimum
+
+
+def accept_improvement(policy: Optional[AcceptancePolicy], current_step: str,
+                       improved_step: str, fidelity: float) -> bool:
+    """Apply ``policy`` to a reflected step; with no policy every improvement is rejected."""
+    accepted = policy is not None and policy.accept(current_step, improved_step, fidelity)
+    count('steps_accepted' if accepted else 'steps_rejected')
+    return accepted
+
+
+class StepConvergenceTracker:
+    """
+    Per-step fidelity windows of one solve, deciding which steps are frozen.
+
+    Each reflection on a step adds the fidelity between the step's current and improved
+    states. A step converges once its last ``window`` fidelities spread by less than
+    ``threshold`` and average above ``convergence_threshold``; converged steps are not
+    reflected on again.
+    """
+
+    def __init__(self, n_steps: int, window: int = 3, threshold: float = 0.001,
+                 convergence_threshold: float = 0.98):
+        self.threshold = threshold
+        self.convergence_threshold = convergence_threshold
+        self.fidelities: List[Deque[float]] = [deque(maxlen=window) for _ in range(n_steps)]
+        self.converged: List[bool] = [False] * n_steps
+
+    def __len__(self) -> int:
+        return len(self.converged)
+
+    @property
+    def all_converged(self) -> bool:
+        """True when there are steps and every one of them has converged."""
+        return bool(self.converged) and all(self.converged)
+
+    def unconverged(self) -> List[int]:
+        """Indices of the steps still being reflected on."""
+        return [i for i, converged in enumerate(self.converged) if not converged]
+
+    def converged_step_numbers(self) -> List[int]:
+        """1-based numbers of the converged steps."""
+        return [i + 1 for i, converged in enumerate(self.converged) if converged]
+
+    def update(self, step: int, fidelity: float) -> bool:
+        """Add a fidelity for step index ``step`` and return whether the step converged with it."""
+        recent = self.fidelities[step]
+        recent.append(fidelity)
+        if (self.converged[step] or len(recent) < recent.maxlen or
+                max(recent) - min(recent) >= self.threshold or
+                np.mean(recent) <= self.convergence_threshold):
+            return False
+        self.converged[step] = True
+        return True
+
+
+def state_history_capacity(n_steps: int, iterations: Optional[int], max_iterations: int) -> int:
+    """
+    Number of step states kept by a solve with ``n_steps`` steps.
+
+    ``iterations`` iterations are kept (all ``max_iterations`` when None), and never fewer
+    than the two the overall convergence check compares.
+    """
+    return max(iterations or max_iterations, 2) * n_steps
+
+
+class QuantumStateAnalyzer:
+    """
+    Quantum scoring of solution text without a language model.
+
+    Texts (or raw token ids) are encoded as quantum feature states and evolved under the
+    configured Hamiltonian; evolved states are memoized in a bounded cache. On top of the
+    states the analyzer measures convergence, step complexity and solution stability, and
+    scores whole transcripts in batches.
+    """
+
+    def __init__(self,
+                 tokenizer: Union[None, str, Any] = None,
+                 vocab_size: Optional[int] = None,
+                 dimension: int = 512,
+                 hamiltonian: Union[None, str, HamiltonianFamily] = None,
+                 evolution_time: float = 1.0,
+                 state_cache_entries: Optional[int] = 4096,
+                 state_cache_bytes: Optional[int] = 64 * 1024 * 1024):
+        """
+        Initialize the analyzer.
+
+        Args:
+            tokenizer: Loaded tokenizer, or a model path to load one from on first use.
+                None analyzes raw token ids only (see apply_quantum_operation_token_ids)
+            vocab_size: Vocabulary size used to scale token amplitudes (defaults to the
+                tokenizer's; required without a tokenizer)
+            dimension: Dimension of the quantum state space
+            hamiltonian: Hamiltonian family name or instance (defaults to the ring coupling)
+            evolution_time: Time the encoded states are evolved for
+            state_cache_entries: Maximum number of memoized quantum states (None for unbounded)
+            state_cache_bytes: Maximum total size of memoized quantum states (None for unbounded)
+        """
+        if tokenizer is None and vocab_size is None:
+            raise ValueError("vocab_size is required to analyze raw token ids without a tokenizer")
+        self.tokenizer_path = tokenizer if isinstance(tokenizer, str) else None
+        self._tokenizer = None if isinstance(tokenizer, str) else tokenizer
+        self._vocab_size = vocab_size
+        self._load_lock = threading.Lock()
+        # Tokenizers are not thread-safe; anything sharing this analyzer's tokenizer holds this
+        self.tokenizer_lock = threading.RLock()
+
+        # Quantum components
+        self.dimension = dimension
+        self.evolution_time = evolution_time
+        # Fold tokens beyond `dimension` into the state instead of truncating
+        self.fold_tokens = False
+        self.hamiltonian = make_hamiltonian(hamiltonian)
+        self.state_cache = ArrayCache(max_bytes=state_cache_bytes, max_entries=state_cache_entries)
+
+        # Stability parameters
+        self.stability_window = 3
+        self.stability_threshold = 0.001
+        # History for check_solution_stability calls that pass none, created on first use
+        self._default_stability_tracker: Optional[StabilityTracker] = None
+
+    @property
+    def tokenizer(self) -> Any:
+        """The tokenizer, loaded from ``tokenizer_path`` on first access."""
+        if self._tokenizer is None:
+            if self.tokenizer_path is None:
+                raise ValueError("This analyzer has no tokenizer; pass token ids instead of text")
+            with self._load_lock:
+                if self._tokenizer is None:
+                    from transformers import AutoTokenizer
+
+                    with timed('load_tokenizer'):
+                        self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_path,
+                                                                        use_fast=True)
+        return self._tokenizer
+
+    @tokenizer.setter
+    def tokenizer(self, tokenizer: Any) -> None:
+        self._tokenizer = tokenizer
+
+    @property
+    def vocab_size(self) -> int:
+        return self._vocab_size if self._vocab_size is not None else self.tokenizer.vocab_size
+
+    @property
+    def evolution_engine(self) -> EvolutionEngine:
+        """Shared evolution engine for this analyzer's Hamiltonian, dimension and time."""
+        return get_evolution_engine(self.hamiltonian, self.dimension, self.evolution_time)
+
+    def token_ids(self, texts: Sequence[str]) -> List[List[int]]:
+        """Tokenize many texts with one batch call."""
+        with self.tokenizer_lock:
+            return self.tokenizer(list(texts))["input_ids"]
+
+    def encode_quantum_features(self, text: str) -> np.ndarray:
+        """Encode text as a normalized (unevolved) quantum feature state."""
+        with self.tokenizer_lock:
+            tokens = self.tokenizer.encode(text)
+        return encode_token_batch([tokens], self.dimension, self.vocab_size,
+                                  fold=self.fold_tokens)[0]
+
+    def _state_cache_key(self, kind: str, content: bytes) -> Tuple:
+        """Content hash of everything that determines an evolved state."""
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        if kind == 'text':
+            tokenizer = self.tokenizer
+            source = (getattr(tokenizer, "name_or_path", type(tokenizer).__name__), self.vocab_size)
+        else:
+            source = ('token_ids', self.vocab_size)
+        return (digest, self.dimension, source, self.hamiltonian.key,
+                self.evolution_time, self.fold_tokens)
+
+    def _remember_state(self, key: Tuple, state: np.ndarray) -> np.ndarray:
+        state.setflags(write=False)
+        self.state_cache.put(key, state)
+        return state
+
+    def state_cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size of the quantum state cache."""
+        return {
+            'hits': self.state_cache.hits,
+            'misses': self.state_cache.misses,
+            'entries': len(self.state_cache),
+            'bytes': self.state_cache.nbytes
+        }
+
+    def apply_quantum_operation(self, text: str) -> np.ndarray:
+        """
+        Apply quantum operations to analyze solution quality.
+
+        Returns a fresh array; the memoized state itself stays read-only in the cache.
+        """
+        key = self._state_cache_key('text', text.encode("utf-8"))
+        evolved_state = self.state_cache.get(key)
+        if evolved_state is None:
+            count('state_cache_misses')
+            with timed('quantum_encode'):
+                features = self.encode_quantum_features(text)
+            with timed('evolve'):
+                evolved_state = self._remember_state(key, self.evolution_engine.apply(features))
+        else:
+            count('state_cache_hits')
+
+        return evolved_state.copy()
+
+    def _evolve_batch(self, keys: List[Tuple], token_ids) -> np.ndarray:
+        """
+        Evolved states for ``keys``, encoding and evolving only the cache misses.
+
+        ``token_ids(indices)`` returns the token ids of the missing rows.
+        """
+        states = [self.state_cache.get(key) for key in keys]
+        missing = [i for i, state in enumerate(states) if state is None]
+        count('state_cache_hits', len(keys) - len(missing))
+        count('state_cache_misses', len(missing))
+        if missing:
+            with timed('quantum_encode'):
+                features = encode_token_batch(token_ids(missing), self.dimension, self.vocab_size,
+                                              fold=self.fold_tokens)
+            with timed('evolve'):
+                evolved_states = self.evolution_engine.apply(features)
+            for i, evolved_state in zip(missing, evolved_states):
+                states[i] = self._remember_state(keys[i], evolved_state.copy())
+        if not states:
+            return np.zeros((0, self.dimension), dtype=complex)
+        return np.stack(states)
+
+    def apply_quantum_operation_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Apply quantum operations to many texts at once.
+
+        Texts already in the state cache are looked up; the rest are tokenized with one
+        batch encode, encoded into a feature matrix in a single vectorized pass and evolved
+        together (one FFT over the batch, or one GEMM against the cached unitary for dense
+        Hamiltonians).
+
+        Args:
+            texts: Texts to encode
+
+        Returns:
+            Array of shape (len(texts), dimension); row i equals apply_quantum_operation(texts[i])
+        """
+        keys = [self._state_cache_key('text', text.encode("utf-8")) for text in texts]
+        return self._evolve_batch(keys, lambda missing: self.token_ids([texts[i] for i in missing]))
+
+    def apply_quantum_operation_token_ids(self, token_ids: Sequence[Sequence[int]]) -> np.ndarray:
+        """
+        Apply quantum operations to already tokenized texts; no tokenizer is needed.
+
+        Args:
+            token_ids: One sequence of token ids per text
+
+        Returns:
+            Array of shape (len(token_ids), dimension)
+        """
+        rows = [np.asarray(ids, dtype=np.int64) for ids in token_ids]
+        keys = [self._state_cache_key('token_ids', row.tobytes()) for row in rows]
+        return self._evolve_batch(keys, lambda missing: [rows[i] for i in missing])
+
+    def quantum_trajectory(self, text: str,
+                           times: Union[float, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evolve the encoded text to several evolution times at once.
+
+        Args:
+            text: Text to encode
+            times: Scalar or 1-D array of evolution times
+
+        Returns:
+            Tuple of (states with shape (len(times), dimension), fidelity of each state
+            against the unevolved encoding)
+        """
+        features = self.encode_quantum_features(text)
+        engine = self.evolution_engine
+        trajectory = engine.evolve(features, times)
+        fidelities = engine.time_resolved_fidelity(features, features, times)
+        return trajectory, fidelities
+
+    def create_hamiltonian(self) -> np.ndarray:
+        """Create the Hamiltonian operator for quantum evolution."""
+        with timed('create_hamiltonian'):
+            return self.hamiltonian.build(self.dimension)
+
+    def measure_convergence(self, prev_state: np.ndarray, current_state: np.ndarray) -> float:
+        """Measure the convergence between quantum states."""
+        fidelity = np.abs(np.vdot(prev_state, current_state)) ** 2
+        return float(fidelity)
+
+    def measure_block_convergence(self, prev_states: np.ndarray,
+                                  current_states: np.ndarray) -> BlockFidelity:
+        """
+        Measure the convergence between two (n_steps x dimension) blocks of step states.
+
+        Row i of one block is compared with row i of the other in a single batched pass.
+
+        Returns:
+            BlockFidelity with the per-step fidelities and their mean, minimum and mean
+            trace distance
+        """
+        return block_fidelity(prev_states, current_states)
+
+    def stability_tracker(self) -> StabilityTracker:
+        """A fresh StabilityTracker with this analyzer's stability window and threshold."""
+        return StabilityTracker(self.stability_window, self.stability_threshold)
+
+    def check_solution_stability(
+        self, current_solution: str,
+        solution_history: Union[StabilityTracker, MutableSequence[str], None] = None,
+    ) -> bool:
+        """
+        Check if the solution has stabilized over recent iterations.
+
+        Args:
+            current_solution: Newest complete solution text
+            solution_history: The session's StabilityTracker, which is updated incrementally,
+                or a sequence of earlier solutions that is re-scanned and updated in place.
+                None uses a tracker kept on the analyzer across calls, as the one-argument
+                form did before histories moved to sessions; it is not safe to share
+                between concurrent solves.
+        """
+        if solution_history is None:
+            if self._default_stability_tracker is None:
+                self._default_stability_tracker = self.stability_tracker()
+            solution_history = self._default_stability_tracker
+        if isinstance(solution_history, StabilityTracker):
+            return solution_history.update(current_solution)
+
+        if len(solution_history) < self.stability_window:
+            solution_history.append(current_solution)
+            return False
+
+        # Compare with previous solutions
+        solution_history.append(current_solution)
+        recent_solutions = list(solution_history)[-self.stability_window:]
+
+        # Extract numerical values and key mathematical terms
+        solution_elements = [extract_key_elements(sol) for sol in recent_solutions]
+
+        # Check if solutions have stabilized
+        is_stable = all(
+            len(solution_elements[i].symmetric_difference(solution_elements[i-1])) /
+            max(len(solution_elements[i]), 1) < self.stability_threshold
+            for i in range(1, len(solution_elements))
+        )
+
+        # Remove oldest solution if window is full (a bounded deque has already dropped it)
+        if len(solution_history) > self.stability_window:
+            del solution_history[0]
+
+        return is_stable
+
+    def extract_solution_steps(self, response: str) -> List[str]:
+        """Extract individual solution steps from the response."""
+        steps = _STEP_PATTERN.split(response)[1:]
+        return [step.strip() for step in steps]
+
+    def analyze_step_complexity(self, step: str) -> float:
+        """Analyze the mathematical complexity of a solution step."""
+        return step_complexity(step)
+
+    def analyze_transcripts(self, transcripts: List[str]) -> List[Dict]:
+        """
+        Score many solution transcripts.
+
+        The steps of all transcripts are encoded and evolved in one batch, so scoring a
+        corpus costs one tokenizer call and one evolution per batch rather than per step.
+
+        Args:
+            transcripts: Complete solution texts in the "Step N:" format
+
+        Returns:
+            One dict per transcript with 'num_steps', 'complexity_scores',
+            'mean_complexity' and 'step_convergence' (fidelity between the quantum
+            states of consecutive steps)
+        """
+        transcript_steps = [self.extract_solution_steps(text) for text in transcripts]
+        states = self.apply_quantum_operation_batch(
+            [step for steps in transcript_steps for step in steps]
+        )
+
+        analyses, offset = [], 0
+        for steps in transcript_steps:
+            step_states = states[offset:offset + len(steps)]
+            offset += len(steps)
+            overlaps = np.einsum('ij,ij->i', step_states[:-1].conj(), step_states[1:])
+            complexity_scores = [self.analyze_step_complexity(step) for step in steps]
+            analyses.append({
+                'num_steps': len(steps),
+                'complexity_scores': complexity_scores,
+                'mean_complexity': float(np.mean(complexity_scores)) if steps else 0.0,
+                'step_convergence': (np.abs(overlaps) ** 2).tolist()
+            })
+        return analyses
+
+    def analyze_transcript(self, transcript: str) -> Dict:
+        """Score one solution transcript; see analyze_transcripts."""
+        return self.analyze_transcripts([transcript])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Score solution transcripts without loading a language model"
+    )
+    parser.add_argument("paths", nargs="+", help="Transcript files, one solution per file")
+    parser.add_argument("--tokenizer", default="unsloth/Meta-Llama-3.1-8B-Instruct",
+                        help="Tokenizer name or path")
+    parser.add_argument("--dimension", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64, help="Transcripts scored per batch")
+    args = parser.parse_args()
+
+    analyzer = QuantumStateAnalyzer(args.tokenizer, dimension=args.dimension)
+    for start in range(0, len(args.paths), args.batch_size):
+        paths = args.paths[start:start + args.batch_size]
+        transcripts = []
+        for path in paths:
+            with open(path, encoding="utf-8") as handle:
+                transcripts.append(handle.read())
+        for path, analysis in zip(paths, analyzer.analyze_transcripts(transcripts)):
+            sys.stdout.write(json.dumps({'path': path, **analysis}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
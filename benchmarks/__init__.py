@@ -0,0 +1 @@
+"""Offline benchmark suites for the quantum reflection solvers."""
@@ -0,0 +1,142 @@
+"""
+Micro-benchmarks of the quantum pipeline, independent of the language model.
+
+Measures Hamiltonian construction, the evolution operator, quantum state encoding and
+evolution, convergence measurement, stability checks, step extraction and complexity
+scoring across state dimensions and text sizes. The solver is built on the offline fake
+tokenizer and model from ``benchmarks.fakes``, so no network or GPU is needed.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_quantum --output results/quantum.json
+    python -m benchmarks.bench_quantum --quick
+"""
+import argparse
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.common import measure, synthetic_solution, write_report
+from benchmarks.fakes import make_fake_solver
+from quantum_ops import EvolutionEngine, OperatorCache
+
+DEFAULT_DIMENSIONS = [128, 256, 512, 1024, 2048, 4096, 8192]
+DEFAULT_TEXT_TOKENS = [64, 512, 4096]
+QUICK_DIMENSIONS = [128, 512]
+QUICK_TEXT_TOKENS = [64, 512]
+
+
+def random_state(dimension: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    state = rng.normal(size=dimension) + 1j * rng.normal(size=dimension)
+    return state / np.linalg.norm(state)
+
+
+def bench_dimension(dimension: int, text_tokens: List[int], repeat: int, min_time: float,
+                    max_dense_dimension: int) -> List[Dict]:
+    """Benchmarks whose cost depends on the state dimension."""
+    solver = make_fake_solver(dimension=dimension)
+    results = []
+
+    def record(benchmark: str, seconds: Dict, **params) -> None:
+        results.append({'benchmark': benchmark, 'dimension': dimension, **params,
+                        'seconds': seconds})
+
+    record('create_hamiltonian', measure(solver.create_hamiltonian, repeat, min_time))
+    record('evolution_engine_setup', measure(
+        lambda: EvolutionEngine(solver.hamiltonian, dimension,
+                                operator_cache=OperatorCache(max_bytes=None)),
+        repeat, min_time
+    ))
+    if dimension <= max_dense_dimension:
+        # Dense U = exp(-iH) through one eigh, as used for non-circulant Hamiltonians
+        record('evolution_operator_dense', measure(
+            lambda: EvolutionEngine(solver.hamiltonian, dimension,
+                                    operator_cache=OperatorCache(max_bytes=None)).operator(),
+            max(1, repeat // 2), 0.0
+        ))
+
+    engine = solver.evolution_engine
+    states = np.stack([random_state(dimension, seed) for seed in range(16)])
+    record('evolve', measure(lambda: engine.apply(states[0]), repeat, min_time), batch=1)
+    record('evolve', measure(lambda: engine.apply(states), repeat, min_time), batch=len(states))
+    record('measure_convergence', measure(lambda: solver.measure_convergence(states[0], states[1]),
+                                          repeat, min_time))
+    record('measure_block_convergence', measure(
+        lambda: solver.measure_block_convergence(states[:8], states[8:]), repeat, min_time
+    ), batch=8)
+
+    for n_tokens in text_tokens:
+        text = synthetic_solution(n_tokens)
+        texts = [synthetic_solution(n_tokens, seed) for seed in range(8)]
+        record('apply_quantum_operation', measure(
+            lambda: solver.apply_quantum_operation(text), repeat, min_time,
+            setup=solver.state_cache.clear
+        ), text_tokens=n_tokens, cached=False)
+        record('apply_quantum_operation', measure(
+            lambda: solver.apply_quantum_operation(text), repeat, min_time
+        ), text_tokens=n_tokens, cached=True)
+        record('apply_quantum_operation_batch', measure(
+            lambda: solver.apply_quantum_operation_batch(texts), repeat, min_time,
+            setup=solver.state_cache.clear
+        ), text_tokens=n_tokens, batch=len(texts), cached=False)
+    return results
+
+
+def bench_text(text_tokens: List[int], repeat: int, min_time: float) -> List[Dict]:
+    """Benchmarks of the text-processing steps, which do not depend on the dimension."""
+    solver = make_fake_solver(dimension=128)
+    results = []
+    for n_tokens in text_tokens:
+        text = synthetic_solution(n_tokens)
+        history = [synthetic_solution(n_tokens, seed)
+                   for seed in range(1, solver.stability_window + 1)]
+        tracker = solver.stability_tracker()
+        for solution in history:
+            tracker.update(solution)
+        for benchmark, fn in [
+            ('check_solution_stability',
+             lambda: solver.check_solution_stability(text, list(history))),
+            ('check_solution_stability_incremental',
+             lambda: solver.check_solution_stability(text, tracker)),
+            ('extract_solution_steps', lambda: solver.extract_solution_steps(text)),
+            ('analyze_step_complexity', lambda: solver.analyze_step_complexity(text)),
+        ]:
+            results.append({'benchmark': benchmark, 'text_tokens': n_tokens,
+                            'seconds': measure(fn, repeat, min_time)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the quantum pipeline without a language model"
+    )
+    parser.add_argument("--dimensions", type=int, nargs="+", default=None,
+                        help=f"State dimensions (default {DEFAULT_DIMENSIONS})")
+    parser.add_argument("--text-tokens", type=int, nargs="+", default=None,
+                        help=f"Synthetic text sizes in tokens (default {DEFAULT_TEXT_TOKENS})")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed rounds per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per round")
+    parser.add_argument("--max-dense-dimension", type=int, default=2048,
+                        help="Largest dimension for the dense evolution operator benchmark")
+    parser.add_argument("--quick", action="store_true",
+                        help="Small dimensions and texts for a smoke run")
+    parser.add_argument("--output", default=None, help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    logging.getLogger("quantum_reflection").setLevel(logging.WARNING)
+    dimensions = args.dimensions or (QUICK_DIMENSIONS if args.quick else DEFAULT_DIMENSIONS)
+    text_tokens = args.text_tokens or (QUICK_TEXT_TOKENS if args.quick else DEFAULT_TEXT_TOKENS)
+    repeat = 2 if args.quick else args.repeat
+    min_time = 0.01 if args.quick else args.min_time
+
+    results = bench_text(text_tokens, repeat, min_time)
+    for dimension in dimensions:
+        results.extend(bench_dimension(dimension, text_tokens, repeat, min_time,
+                                       args.max_dense_dimension))
+    write_report('quantum', results, args.output, dimensions=dimensions, text_tokens=text_tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+End-to-end throughput benchmark of GeneralQuantumSolver.solve with a mock language model.
+
+Every problem is solved through the real reflection loop; only the language model and
+tokenizer are replaced by the deterministic offline fakes from ``benchmarks.fakes``. The
+fake model sleeps ``--latency-per-token`` per decoding step (and optionally per prefilled
+prompt token), so wall times approximate a real deployment once those are set to the
+measured latencies of the target hardware.
+
+Reports, per domain and overall: wall time, solves per hour, the per-stage breakdown from
+each solve's perf report, tokens, iterations to convergence and peak RSS.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_solve --latency-per-token 0.02 --output results/solve.json
+    python -m benchmarks.bench_solve --mode solve_many --batch-size 8
+    python -m benchmarks.bench_solve --problems-file problems.jsonl   # {"problem", "domain"} lines
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from benchmarks.common import write_report
+from benchmarks.fakes import make_fake_solver
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROBLEM_SETS = {
+    'algebra': [
+        "Solve the system x + y = 2, x - y = 0.",
+        "Find all real x with x^2 - 5x + 6 = 0.",
+        "Determine all real numbers α such that ⌊α⌋ + ⌊2α⌋ + ... + ⌊nα⌋ is a multiple of n "
+        "for every positive integer n.",
+    ],
+    'number_theory': [
+        "Show that n^3 - n is divisible by 6 for every integer n.",
+        "Find all primes p such that p^2 + 2 is prime.",
+        "Determine the last two digits of 7^2024.",
+    ],
+    'geometry': [
+        "A triangle has sides 3, 4 and 5. Find the radius of its inscribed circle.",
+        "Find the area of a regular hexagon with side length 2.",
+    ],
+    'calculus': [
+        "Evaluate the integral of x e^x from 0 to 1.",
+        "Find the minimum of f(x) = x^2 - 4x + 7.",
+    ],
+}
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far, or None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def load_problems(path: Optional[str], domains: Optional[List[str]],
+                  repeat: int) -> Dict[str, List[str]]:
+    """Problems grouped by domain, from a JSONL file or the built-in sets."""
+    if path:
+        problems = defaultdict(list)
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    entry = json.loads(line)
+                    problems[entry.get('domain') or 'general'].append(entry['problem'])
+    else:
+        problems = dict(PROBLEM_SETS)
+    if domains:
+        problems = {domain: problems[domain] for domain in domains if domain in problems}
+    return {domain: items * repeat for domain, items in problems.items()}
+
+
+def merge_stages(analyses: List[Dict]) -> Dict[str, Dict]:
+    """Sum the per-stage perf reports of many solves."""
+    stages = defaultdict(lambda: {'seconds': 0.0, 'calls': 0})
+    for analysis in analyses:
+        for stage, timing in analysis['perf']['stages'].items():
+            stages[stage]['seconds'] += timing['seconds']
+            stages[stage]['calls'] += timing['calls']
+    return dict(stages)
+
+
+def summarize(domain: str, analyses: List[Dict], wall_seconds: float,
+              solve_seconds: Optional[List[float]] = None,
+              extra_stages: Optional[Dict] = None) -> Dict:
+    stages = merge_stages(analyses)
+    for stage, timing in (extra_stages or {}).items():
+        merged = stages.setdefault(stage, {'seconds': 0.0, 'calls': 0})
+        merged['seconds'] += timing['seconds']
+        merged['calls'] += timing['calls']
+    stages = dict(sorted(stages.items(), key=lambda item: item[1]['seconds'], reverse=True))
+    iterations = [analysis['iterations'] for analysis in analyses]
+    prompt_tokens = sum(analysis['prompt_tokens'] for analysis in analyses)
+    completion_tokens = sum(analysis['completion_tokens'] for analysis in analyses)
+    summary = {
+        'domain': domain,
+        'problems': len(analyses),
+        'wall_seconds': wall_seconds,
+        'solves_per_hour': 3600 * len(analyses) / wall_seconds if wall_seconds > 0 else 0.0,
+        'stages': stages,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'completion_tokens_per_second': (completion_tokens / wall_seconds
+                                         if wall_seconds > 0 else 0.0),
+        'iterations': {
+            'mean': statistics.fmean(iterations) if iterations else 0.0,
+            'histogram': dict(sorted(Counter(iterations).items()))
+        },
+        'peak_rss_bytes': peak_rss_bytes()
+    }
+    if solve_seconds:
+        summary['solve_seconds'] = {
+            'mean': statistics.fmean(solve_seconds),
+            'median': statistics.median(solve_seconds),
+            'max': max(solve_seconds)
+        }
+    return summary
+
+
+def run_domain(solver, domain: str, problems: List[str], mode: str, max_tokens: int,
+               batch_size: int) -> Dict:
+    start = time.perf_counter()
+    if mode == 'solve_many':
+        batch = solver.solve_many(problems, domain=domain, max_tokens=max_tokens,
+                                  batch_size=batch_size)
+        analyses = batch['results']
+        return summarize(domain, analyses, time.perf_counter() - start,
+                         extra_stages=batch['throughput']['perf']['stages'])
+    analyses, solve_seconds = [], []
+    for problem in problems:
+        solve_start = time.perf_counter()
+        analyses.append(solver.solve(problem, max_tokens=max_tokens, domain=domain))
+        solve_seconds.append(time.perf_counter() - solve_start)
+    return summarize(domain, analyses, time.perf_counter() - start, solve_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-end solve throughput with a mock language model"
+    )
+    parser.add_argument("--domains", nargs="+", default=None,
+                        help=f"Subset of {sorted(PROBLEM_SETS)}")
+    parser.add_argument("--problems-file", default=None,
+                        help="JSONL file of {\"problem\", \"domain\"} entries")
+    parser.add_argument("--repeat", type=int, default=1, help="Solve every problem this many times")
+    parser.add_argument("--mode", choices=["solve", "solve_many"], default="solve")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="Prompts per generate call in solve_many mode")
+    parser.add_argument("--dimension", type=int, default=512)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--latency-per-token", type=float, default=0.0,
+                        help="Simulated seconds per decoding step")
+    parser.add_argument("--prefill-latency-per-token", type=float, default=0.0,
+                        help="Simulated seconds per prefilled prompt token")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for the mock model's canned completions")
+    parser.add_argument("--output", default=None, help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    logging.getLogger("quantum_reflection").setLevel(logging.WARNING)
+    problems = load_problems(args.problems_file, args.domains, args.repeat)
+    solver = make_fake_solver(dimension=args.dimension, latency_per_token=args.latency_per_token,
+                              prefill_latency_per_token=args.prefill_latency_per_token,
+                              seed=args.seed)
+
+    start = time.perf_counter()
+    domains = [run_domain(solver, domain, items, args.mode, args.max_tokens, args.batch_size)
+               for domain, items in problems.items()]
+    wall_seconds = time.perf_counter() - start
+
+    total_problems = sum(summary['problems'] for summary in domains)
+    all_iterations = Counter()
+    for summary in domains:
+        all_iterations.update(summary['iterations']['histogram'])
+    overall = {
+        'problems': total_problems,
+        'wall_seconds': wall_seconds,
+        'solves_per_hour': 3600 * total_problems / wall_seconds if wall_seconds > 0 else 0.0,
+        'generate_calls': solver.model.generate_calls,
+        'iterations_histogram': dict(sorted(all_iterations.items())),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'state_cache': solver.state_cache_stats()
+    }
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    write_report('solve', domains, args.output, config=config, overall=overall)
+
+
+if __name__ == "__main__":
+    main()
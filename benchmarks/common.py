@@ -0,0 +1,111 @@
+"""Timing and reporting helpers shared by the benchmark scripts."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.05,
+            setup: Optional[Callable[[], object]] = None) -> Dict:
+    """
+    Time ``fn`` like timeit: each of ``repeat`` rounds runs enough calls to last ``min_time``.
+
+    Args:
+        fn: Callable to time
+        repeat: Number of timed rounds
+        min_time: Minimum duration of one round in seconds (a round is at least one call)
+        setup: Optional callable run before every call, outside the timed region
+
+    Returns:
+        Per-call seconds: 'min', 'median', 'mean', 'stdev', plus 'rounds' and 'calls_per_round'
+    """
+    if setup is not None:
+        setup()
+    start = time.perf_counter()
+    fn()
+    first = time.perf_counter() - start
+    number = max(1, int(min_time / first)) if first > 0 else 1000
+
+    samples = []
+    for _ in range(repeat):
+        elapsed = 0.0
+        for _ in range(number):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            fn()
+            elapsed += time.perf_counter() - start
+        samples.append(elapsed / number)
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'rounds': repeat,
+        'calls_per_round': number
+    }
+
+
+def environment() -> Dict:
+    """Machine and library versions to store alongside results."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': commit,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def write_report(suite: str, results: List[Dict], output: Optional[str] = None, **metadata) -> Dict:
+    """
+    Write benchmark results as JSON to ``output`` (or stdout) and return the report.
+
+    Every result is a flat dict with at least 'benchmark' and 'seconds' (a measure() dict).
+    """
+    report = {'suite': suite, 'environment': environment(), **metadata, 'results': results}
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+def synthetic_solution(n_tokens: int, seed: int = 0) -> str:
+    """Deterministic step-formatted solution text of roughly ``n_tokens`` tokens."""
+    rng = np.random.default_rng(seed)
+    symbols = ["+", "-", "=", "≤", "∈", "√", "∑", "π", "α", "⌊", "⌋"]
+    words = ["let", "then", "hence", "since", "integer", "sum", "floor", "divisible", "case",
+             "even", "odd"]
+    parts, tokens, step = [], 0, 1
+    while tokens < n_tokens:
+        if tokens == 0 or rng.random() < 0.04:
+            parts.append(f"Step {step}:")
+            step += 1
+        choice = rng.random()
+        if choice < 0.4:
+            parts.append(words[rng.integers(len(words))])
+        elif choice < 0.7:
+            parts.append(symbols[rng.integers(len(symbols))])
+        else:
+            parts.append(str(int(rng.integers(-50, 500))))
+        tokens += 1
+    return " ".join(parts)
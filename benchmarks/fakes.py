@@ -0,0 +1,227 @@
+"""
+Offline stand-ins for the Hugging Face tokenizer and causal LM.
+
+They implement just the surface GeneralQuantumSolver and QuantumReflectionSystem use, so
+the solvers can be constructed and driven on a CPU-only box with no network and no model
+weights. Both are deterministic: the tokenizer assigns word-piece ids in first-seen order
+and the model picks canned completions by hashing the prompt, so a prompt gets the same
+completion regardless of batching or call order. The model can also simulate generation
+latency per prompt token and per generated token.
+"""
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence, Union
+
+import torch
+from transformers import BatchEncoding
+
+# Words, single digits and single symbols, each keeping its leading whitespace so decoding
+# is an exact inverse of encoding
+_TOKEN_PATTERN = re.compile(r"\s*[^\W\d_]+|\s*\d|\s*\S|\s+")
+
+# Initial solutions, in the step format the system prompt asks for
+CANNED_RESPONSES = [
+    "Step 1: Let x + y = 2 and x - y = 0 ∴ x = 1\n"
+    "Step 2: Substitute x = 1 to get y = 1, so α = 2k for every integer k\n"
+    "Step 3: Check n = 1, 2, 3: ⌊α⌋ + ⌊2α⌋ = 3α is divisible by n ∴ α = 2k",
+    "Step 1: Let x + y = 2 ∴ x = 1 → Insight: symmetry fixes y = 1\n"
+    "Step 2: Then y = 2 - x = 1 and x · y = 1",
+    "Step 1: For even n = 2m the sum is m(n + 1)α, so α = 2k satisfies it\n"
+    "Step 2: For odd n the sum is n(n + 1)α / 2 ∴ n divides it when α ∈ 2ℤ\n"
+    "Step 3: Hence α = 2k for k ∈ ℤ\n"
+    "Step 4: → Insight: the even integers are exactly the solutions",
+]
+
+# Improved versions of a single step, returned for reflection prompts
+CANNED_STEP_RESPONSES = [
+    "Let x + y = 2 and x - y = 0, so adding gives 2x = 2 ∴ x = 1",
+    "Substitute x = 1 into x + y = 2 to get y = 1 ∴ α = 2k",
+    "For n = 2m the sum equals m(n + 1)α, which n divides exactly when α = 2k",
+    "Since ⌊kα⌋ = kα for integer α, the sum is n(n + 1)α / 2 ∴ α ∈ 2ℤ",
+]
+
+_REFLECTION_PATTERN = re.compile(r"improve Step (\d+)")
+
+
+class FakeTokenizer:
+    """Deterministic word-level tokenizer with a vocabulary grown on first use."""
+
+    def __init__(self, vocab_size: int = 32000, name_or_path: str = "fake-tokenizer"):
+        self.vocab_size = vocab_size
+        self.name_or_path = name_or_path
+        self.padding_side = "right"
+        self.pad_token, self.bos_token = "<pad>", "<s>"
+        self.eos_token, self.unk_token = "</s>", "<unk>"
+        self.pad_token_id, self.bos_token_id, self.eos_token_id, self.unk_token_id = 0, 1, 2, 3
+        self._pieces: List[str] = [self.pad_token, self.bos_token, self.eos_token, self.unk_token]
+        self._ids: Dict[str, int] = {piece: i for i, piece in enumerate(self._pieces)}
+        self._lock = threading.Lock()
+
+    def _piece_id(self, piece: str) -> int:
+        piece_id = self._ids.get(piece)
+        if piece_id is None:
+            with self._lock:
+                piece_id = self._ids.get(piece)
+                if piece_id is None:
+                    if len(self._pieces) >= self.vocab_size:
+                        return self.unk_token_id
+                    piece_id = self._ids[piece] = len(self._pieces)
+                    self._pieces.append(piece)
+        return piece_id
+
+    def encode(self, text: str, add_special_tokens: bool = True,
+               return_tensors: Optional[str] = None) -> Union[List[int], torch.Tensor]:
+        ids = [self._piece_id(piece) for piece in _TOKEN_PATTERN.findall(text)]
+        if add_special_tokens:
+            ids.insert(0, self.bos_token_id)
+        if return_tensors == "pt":
+            return torch.tensor([ids])
+        return ids
+
+    def __call__(self, text: Union[str, Sequence[str]], add_special_tokens: bool = True,
+                 padding: bool = False, return_tensors: Optional[str] = None) -> BatchEncoding:
+        texts = [text] if isinstance(text, str) else list(text)
+        input_ids = [self.encode(item, add_special_tokens) for item in texts]
+        attention_mask = [[1] * len(ids) for ids in input_ids]
+        if padding or return_tensors == "pt":
+            width = max((len(ids) for ids in input_ids), default=0)
+            for row, ids in enumerate(input_ids):
+                pad = width - len(ids)
+                if self.padding_side == "left":
+                    input_ids[row] = [self.pad_token_id] * pad + ids
+                    attention_mask[row] = [0] * pad + attention_mask[row]
+                else:
+                    input_ids[row] = ids + [self.pad_token_id] * pad
+                    attention_mask[row] = attention_mask[row] + [0] * pad
+        if isinstance(text, str) and return_tensors is None:
+            input_ids, attention_mask = input_ids[0], attention_mask[0]
+        return BatchEncoding({'input_ids': input_ids, 'attention_mask': attention_mask},
+                             tensor_type=return_tensors)
+
+    def decode(self, token_ids: Union[Sequence[int], torch.Tensor],
+               skip_special_tokens: bool = False, **kwargs) -> str:
+        if isinstance(token_ids, torch.Tensor):
+            token_ids = token_ids.tolist()
+        # Ids not assigned to a piece yet (e.g. sampled by a real model) decode as <unk>
+        return "".join(
+            self._pieces[i] if i < len(self._pieces) else self.unk_token for i in token_ids
+            if not (skip_special_tokens and i <= self.unk_token_id)
+        )
+
+    def batch_decode(self, sequences: Union[Sequence[Sequence[int]], torch.Tensor],
+                     skip_special_tokens: bool = False, **kwargs) -> List[str]:
+        return [self.decode(ids, skip_special_tokens) for ids in sequences]
+
+
+class _NullCache:
+    """Past-key-values placeholder returned by FakeCausalLM's forward pass."""
+
+    def __init__(self, length: int):
+        self.length = length
+
+    def batch_repeat_interleave(self, repeats: int) -> None:
+        pass
+
+
+class FakeCausalLM:
+    """
+    Deterministic stand-in for LlamaForCausalLM.
+
+    ``generate`` appends a canned completion (truncated to ``max_new_tokens`` and padded per
+    row like Hugging Face generation) to each prompt row: a step-formatted solution for
+    problem prompts and an improved step body for step reflection prompts, chosen by a hash
+    of the prompt text and ``seed``.
+
+    Latency is simulated like a batched decoder: prefill costs ``prefill_latency_per_token``
+    per prompt token in the batch, and every decoding step (one token for every row) costs
+    ``latency_per_token``.
+    """
+
+    def __init__(self, tokenizer: FakeTokenizer, responses: Optional[Sequence[str]] = None,
+                 step_responses: Optional[Sequence[str]] = None, latency_per_token: float = 0.0,
+                 prefill_latency_per_token: float = 0.0, seed: int = 0):
+        self.tokenizer = tokenizer
+        self.responses = list(responses or CANNED_RESPONSES)
+        self.step_responses = list(step_responses or CANNED_STEP_RESPONSES)
+        self.latency_per_token = latency_per_token
+        self.prefill_latency_per_token = prefill_latency_per_token
+        self.seed = seed
+        self.generate_calls = 0
+        self.generated_tokens = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, input_ids: torch.Tensor, use_cache: bool = True,
+                 **kwargs) -> SimpleNamespace:
+        if self.prefill_latency_per_token:
+            time.sleep(self.prefill_latency_per_token * input_ids.numel())
+        return SimpleNamespace(past_key_values=_NullCache(input_ids.shape[-1]))
+
+    def _completion(self, prompt_ids: torch.Tensor) -> str:
+        prompt = self.tokenizer.decode(prompt_ids, skip_special_tokens=True)
+        choice = zlib.crc32(f"{self.seed}:{prompt}".encode("utf-8"))
+        reflection = _REFLECTION_PATTERN.search(prompt)
+        if reflection:
+            step_choice = choice + int(reflection.group(1))
+            return self.step_responses[step_choice % len(self.step_responses)]
+        return self.responses[choice % len(self.responses)]
+
+    def generate(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None,
+                 max_new_tokens: int = 20, pad_token_id: Optional[int] = None,
+                 streamer: Optional[object] = None, **kwargs) -> torch.Tensor:
+        pad_token_id = self.tokenizer.pad_token_id if pad_token_id is None else pad_token_id
+        if self.prefill_latency_per_token:
+            # Only tokens not already covered by a prefilled cache are charged
+            prompt_tokens = (attention_mask.sum().item() if attention_mask is not None
+                             else input_ids.numel())
+            past_key_values = kwargs.get('past_key_values')
+            if isinstance(past_key_values, _NullCache):
+                prompt_tokens -= past_key_values.length * input_ids.shape[0]
+            time.sleep(self.prefill_latency_per_token * prompt_tokens)
+        rows = [
+            self.tokenizer.encode(self._completion(prompt_ids),
+                                  add_special_tokens=False)[:max_new_tokens]
+            for prompt_ids in input_ids
+        ]
+        width = max(len(row) for row in rows)
+        new_tokens = torch.tensor([row + [pad_token_id] * (width - len(row)) for row in rows],
+                                  dtype=input_ids.dtype)
+        with self._lock:
+            self.generate_calls += 1
+            self.generated_tokens += sum(len(row) for row in rows)
+        
+        if streamer is not None:
+            streamer.put(input_ids)
+        for step in range(width):
+            if self.latency_per_token:
+                time.sleep(self.latency_per_token)
+            if streamer is not None:
+                streamer.put(new_tokens[0, step:step + 1])
+        if streamer is not None:
+            streamer.end()
+        return torch.cat([input_ids, new_tokens], dim=-1)
+
+
+def make_fake_solver(dimension: int = 512, domain: Optional[str] = None,
+                     latency_per_token: float = 0.0, prefill_latency_per_token: float = 0.0,
+                     seed: int = 0, **kwargs):
+    """
+    Construct a GeneralQuantumSolver backed by FakeTokenizer and FakeCausalLM.
+
+    Args:
+        dimension: Dimension of the quantum state space
+        domain: Default mathematical domain
+        latency_per_token: Simulated seconds per decoding step
+        prefill_latency_per_token: Simulated seconds per prompt token
+        seed: Seed mixed into the model's choice of canned completions
+        **kwargs: Further GeneralQuantumSolver arguments
+    """
+    from general import GeneralQuantumSolver
+
+    tokenizer = FakeTokenizer()
+    model = FakeCausalLM(tokenizer, latency_per_token=latency_per_token,
+                         prefill_latency_per_token=prefill_latency_per_token, seed=seed)
+    return GeneralQuantumSolver(dimension=dimension, domain=domain, model=model,
+                                tokenizer=tokenizer, **kwargs)
@@ -1,18 +1,474 @@
 import numpy as np
-from transformers import AutoTokenizer, LlamaForCausalLM
-import torch
-from scipy.linalg import expm
-from typing import List, Tuple, Dict, Optional, Union
-import nltk
-from nltk.tokenize import sent_tokenize
-import re
-nltk.download('punkt')
+from typing import TYPE_CHECKING, Any, Deque, Iterator, List, Tuple, Dict, Optional, Union
+import copy
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
+from analysis import (AcceptancePolicy, QuantumStateAnalyzer, StabilityTracker,
+                      StepConvergenceTracker, accept_improvement, reflected_step,
+                      state_history_capacity)
+from quantum_ops import BlockFidelity, EvolutionEngine, HamiltonianFamily, StateRingBuffer
+from perf import PerfRecorder, count, profiled, recording, timed
+from tracing import configure_logging, get_logger, span, trace, tracing_enabled
+
+if TYPE_CHECKING:
+    import torch
+
+# torch and transformers are imported on first use, so importing this module (and using
+# the prompt builders or the quantum utilities) does not pay for them
+
+logger = get_logger("general")
+
+
+def _analyzer_attribute(name: str) -> property:
+    """Solver attribute stored on (and shared with) the solver's QuantumStateAnalyzer."""
+    return property(lambda self: getattr(self.analyzer, name),
+                    lambda self, value: setattr(self.analyzer, name, value),
+                    doc=f"Alias of ``analyzer.{name}``.")
+
+
+@dataclass
+class GenerationResult:
+    """Decoded completion of one prompt, excluding the echoed prompt, with token counts."""
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+@dataclass
+class InitialSolutionEvent:
+    """The initial solution was generated and split into steps."""
+    text: str
+    steps: List[str]
+
+
+@dataclass
+class StabilityCheckEvent:
+    """Result of the solution stability check at the start of an iteration."""
+    iteration: int
+    stable: bool
+    consecutive_stable_iterations: int
+
+
+@dataclass
+class StepImprovedEvent:
+    """
+    A step was reflected on; fidelity compares its quantum state before and after, and
+    accepted tells whether the improvement replaced the step.
+    """
+    iteration: int
+    step_number: int
+    text: str
+    fidelity: float
+    accepted: bool
+
+
+@dataclass
+class StepConvergedEvent:
+    """A step's recent fidelities settled; it is frozen and no longer reflected on."""
+    iteration: int
+    step_number: int
+
+
+@dataclass
+class IterationCompleteEvent:
+    """A reflection iteration finished (overall convergence is None on the first one)."""
+    iteration: int
+    overall_convergence: Optional[float]
+
+
+@dataclass
+class ConvergedEvent:
+    """The loop stopped early: reason is 'stabilized', 'converged' or 'steps_converged'."""
+    iteration: int
+    reason: str
+
+
+@dataclass
+class TokenEvent:
+    """A chunk of streamed generation text."""
+    text: str
+
+
+@dataclass
+class ResultEvent:
+    """Final result of a session (a solve()-style analysis for problem sessions)."""
+    result: Dict
+
+
+ReflectionEvent = Union[InitialSolutionEvent, StabilityCheckEvent, StepImprovedEvent,
+                        StepConvergedEvent, IterationCompleteEvent, ConvergedEvent, TokenEvent,
+                        ResultEvent]
+
+_EVENT_NAMES = {
+    InitialSolutionEvent: 'initial_solution',
+    StabilityCheckEvent: 'stability_check',
+    StepImprovedEvent: 'step_improved',
+    StepConvergedEvent: 'step_converged',
+    IterationCompleteEvent: 'iteration_complete',
+    ConvergedEvent: 'converged',
+    TokenEvent: 'token',
+    ResultEvent: 'result'
+}
+
+
+def event_to_dict(event: ReflectionEvent) -> Dict:
+    """Convert an event to a JSON-serializable dict with an 'event' type name."""
+    return {'event': _EVENT_NAMES[type(event)], **asdict(event)}
+
+
+_session_ids = itertools.count(1)
+
+
+class SolveSession:
+    """
+    State of one solve request: the reflection loop's histories for a single problem.
+
+    Sessions are cheap; the heavy model and tokenizer stay on the shared
+    GeneralQuantumSolver, so many sessions (including ones on different threads) can run
+    against one loaded model. A session never calls the model directly: ``pending`` lists
+    the prompts it needs generated next (all sampled at ``temperature``) and ``advance``
+    consumes their results, which lets a scheduler interleave sessions and batch their
+    generations. ``run`` drives a session to completion on its own and ``iter_events``
+    does the same while yielding typed progress events.
+    """
+
+    def __init__(self, solver: "GeneralQuantumSolver", prompt: str, max_new_tokens: int = 2000,
+                 system_prompt: Optional[str] = None, problem: Optional[str] = None,
+                 domain: Optional[str] = None):
+        self.solver = solver
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.system_prompt = system_prompt or solver.system_prompt
+        self.problem = problem
+        self.domain = domain
+        
+        # Per-request histories, bounded by the solver's retention settings
+        self.solution_history = solver.stability_tracker()
+        self.convergence_history: Deque[float] = deque(maxlen=solver.convergence_history_size)
+        self.quantum_states = StateRingBuffer(0, solver.dimension)
+        self.quantum_state = np.zeros(solver.dimension, dtype=complex)
+        self.generations: List[GenerationResult] = []
+        self.solution_found = False
+        
+        self.current_steps: List[str] = []
+        # Which steps are frozen; sized once the initial solution's steps are known
+        self.step_convergence = StepConvergenceTracker(0)
+        self._reflected_steps: List[int] = []
+        self.current_solution = ""
+        self.consecutive_stable_iterations = 0
+        self.iteration = 0
+        self.iterations_needed = 0
+        self.done = False
+        self._step_states = None
+        self._events: List[ReflectionEvent] = []
+        self.session_id = next(_session_ids)
+        self.perf = PerfRecorder()
+        
+        logger.info("Session %d: starting step-by-step analysis", self.session_id)
+        logger.debug("Initial prompt:\n%s", prompt)
+        self.pending: List[str] = [prompt]
+        self.temperature = 0.1
+
+    def advance(self, results: List[GenerationResult]) -> None:
+        """Consume the generations for ``pending`` and plan the next ones."""
+        with recording(self.perf):
+            self.generations.extend(results)
+            if self._step_states is None:
+                self._receive_initial_solution(results[0])
+            else:
+                self._receive_reflections(results)
+            
+            while not self.done:
+                if self.iteration >= self.solver.max_iterations:
+                    self._finish()
+                    break
+                prompts = self._begin_iteration()
+                if prompts:
+                    self.pending = prompts
+                    self.temperature = 0.7
+                    break
+                if not self.done:
+                    # Nothing to reflect on; the iteration still runs its convergence checks
+                    self._receive_reflections([])
+
+    def _receive_initial_solution(self, generation: GenerationResult) -> None:
+        initial_response = generation.text
+        logger.debug("Initial response:\n%s", initial_response)
+        
+        with timed('extract_steps'):
+            self.current_steps = self.solver.extract_solution_steps(initial_response)
+        self.step_convergence = StepConvergenceTracker(
+            len(self.current_steps), self.solver.step_convergence_window,
+            self.solver.stability_threshold, self.solver.convergence_threshold
+        )
+        self.quantum_states = StateRingBuffer(
+            self.solver.state_history_capacity(len(self.current_steps)), self.solver.dimension
+        )
+        self._emit(InitialSolutionEvent(initial_response, list(self.current_steps)))
+        logger.info("Session %d: extracted %d steps", self.session_id, len(self.current_steps))
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, step in enumerate(self.current_steps, 1):
+                logger.debug("Step %d (complexity %.3f):\n%s",
+                             i, self.solver.analyze_step_complexity(step), step)
+
+    def _begin_iteration(self) -> List[str]:
+        """Run the stability check and build this iteration's reflection prompts."""
+        solver = self.solver
+        logger.info("Session %d: reflection iteration %d", self.session_id, self.iteration + 1)
+        
+        self.current_solution = " ".join(self.current_steps)
+        logger.debug("Current complete solution:\n%s", self.current_solution)
+        
+        with timed('stability_check'):
+            stability = solver.check_solution_stability(self.current_solution,
+                                                        self.solution_history)
+        if stability:
+            self.consecutive_stable_iterations += 1
+        else:
+            self.consecutive_stable_iterations = 0
+        logger.info("Session %d: solution %s (consecutive stable iterations: %d)", self.session_id,
+                    'stable' if stability else 'not stable', self.consecutive_stable_iterations)
+        self._emit(StabilityCheckEvent(self.iteration + 1, stability,
+                                       self.consecutive_stable_iterations))
+        
+        if stability and self.consecutive_stable_iterations >= solver.stability_window:
+            logger.info("Session %d: solution stabilized", self.session_id)
+            self._emit(ConvergedEvent(self.iteration + 1, 'stabilized'))
+            self._finish()
+            return []
+        
+        if self.step_convergence.all_converged:
+            logger.info("Session %d: all %d steps converged",
+                        self.session_id, len(self.current_steps))
+            self._emit(ConvergedEvent(self.iteration + 1, 'steps_converged'))
+            self._finish()
+            return []
+        
+        # Every step's state is kept for the overall convergence check; only the steps
+        # that have not converged are reflected on
+        self._step_states = solver.apply_quantum_operation_batch(self.current_steps)
+        self.quantum_states.extend(self._step_states)
+        self._reflected_steps = self.step_convergence.unconverged()
+        debug = logger.isEnabledFor(logging.DEBUG)
+        reflection_prompts = []
+        for i in self._reflected_steps:
+            step = self.current_steps[i]
+            current_state = self._step_states[i]
+            
+            with timed('build_prompts'):
+                reflection_prompt = solver.create_step_reflection_prompt(
+                    step, i+1, len(self.current_steps), current_state, self.system_prompt
+                )
+            if debug:
+                logger.debug("Step %d (quantum state mean amplitude %.4f):\n%s\n"
+                             "Reflection prompt:\n%s",
+                             i + 1, np.abs(current_state).mean(), step, reflection_prompt)
+            reflection_prompts.append(reflection_prompt)
+        return reflection_prompts
+
+    def _receive_reflections(self, reflections: List[GenerationResult]) -> None:
+        """Measure step fidelities and overall convergence for one iteration."""
+        solver = self.solver
+        improved_steps = [reflected_step(reflection.text) for reflection in reflections]
+        reflected_steps = self._reflected_steps[:len(improved_steps)]
+        
+        # The next iteration reflects on next_steps; only accepted improvements change it
+        next_steps = list(self.current_steps)
+        improved_states = solver.apply_quantum_operation_batch(improved_steps)
+        for i, improved_step, step_quantum_state in zip(reflected_steps, improved_steps,
+                                                        improved_states):
+            with timed('convergence'):
+                step_fidelity = solver.measure_convergence(self._step_states[i], step_quantum_state)
+            self.convergence_history.append(step_fidelity)
+            
+            accepted = accept_improvement(solver.acceptance_policy, self.current_steps[i],
+                                          improved_step, step_fidelity)
+            if accepted:
+                next_steps[i] = improved_step
+            
+            logger.debug("Improved step %d (fidelity %.4f, %s):\n%s", i + 1, step_fidelity,
+                         'accepted' if accepted else 'rejected', improved_step)
+            self._emit(StepImprovedEvent(self.iteration + 1, i + 1, improved_step, step_fidelity,
+                                         accepted))
+            
+            if self.step_convergence.update(i, step_fidelity):
+                logger.info("Session %d: step %d converged (recent fidelities %s)",
+                            self.session_id, i + 1, list(self.step_convergence.fidelities[i]))
+                self._emit(StepConvergedEvent(self.iteration + 1, i + 1))
+        
+        self.current_steps = next_steps
+        self.current_solution = " ".join(next_steps)
+        self.quantum_state = solver.apply_quantum_operation(self.current_solution)
+        
+        # Overall convergence: fidelity of each step's state with its state one iteration ago
+        overall_convergence = None
+        n_steps = len(self.current_steps)
+        if self.iteration > 0 and n_steps:
+            with timed('convergence'):
+                block = solver.measure_block_convergence(
+                    self.quantum_states.last(n_steps, skip=n_steps),
+                    self.quantum_states.last(n_steps)
+                )
+            overall_convergence = block.mean
+            logger.info("Session %d: overall convergence %.4f (min step %.4f, trace distance %.4f)",
+                        self.session_id, block.mean, block.min, block.trace_distance)
+        self._emit(IterationCompleteEvent(self.iteration + 1, overall_convergence))
+        
+        if (overall_convergence is not None and
+                overall_convergence > solver.convergence_threshold and
+                self.consecutive_stable_iterations >= solver.stability_window - 1):
+            logger.info("Session %d: overall solution converged", self.session_id)
+            self._emit(ConvergedEvent(self.iteration + 1, 'converged'))
+            self._finish()
+            return
+        
+        self.iteration += 1
+
+    def _finish(self) -> None:
+        self.done = True
+        self.pending = []
+        self.perf.stop()
+        self.iterations_needed = min(self.iteration + 1, self.solver.max_iterations)
+        
+        logger.info("Session %d: finished after %d iterations",
+                    self.session_id, self.iterations_needed)
+        logger.debug("Final convergence history: %s\nFinal solution:\n%s",
+                     list(self.convergence_history), self.current_solution)
+        trace('session_finished', session=self.session_id, iterations=self.iterations_needed,
+              prompt_tokens=sum(g.prompt_tokens for g in self.generations),
+              completion_tokens=sum(g.completion_tokens for g in self.generations))
+
+    def _emit(self, event: ReflectionEvent) -> None:
+        """Record an event for iter_events/drain_events and the trace file."""
+        self._events.append(event)
+        if tracing_enabled():
+            fields = event_to_dict(event)
+            trace(fields.pop('event'), session=self.session_id, **fields)
+
+    def drain_events(self) -> List[ReflectionEvent]:
+        """Return and clear the events recorded since the last call."""
+        events, self._events = self._events, []
+        return events
+
+    def iter_events(self, stream_tokens: bool = False) -> Iterator[ReflectionEvent]:
+        """
+        Drive the session to completion, yielding events as they happen.
+
+        Args:
+            stream_tokens: Also yield TokenEvents while text is generated. Tokens are
+                streamed for single-prompt generations (the initial solution, and every
+                reflection when batch_reflection is off); batched reflections arrive whole.
+
+        Yields:
+            InitialSolutionEvent, StabilityCheckEvent, StepImprovedEvent, StepConvergedEvent,
+            IterationCompleteEvent, ConvergedEvent and TokenEvent instances, ending with
+            a ResultEvent
+        """
+        solver = self.solver
+        while not self.done:
+            if stream_tokens and (len(self.pending) == 1 or not solver.batch_reflection):
+                results = []
+                for pending_prompt in self.pending:
+                    result = yield from self._stream_generation(pending_prompt)
+                    results.append(result)
+            elif solver.batch_reflection:
+                with recording(self.perf):
+                    results = solver._generate_batch(
+                        self.pending, self.temperature, self.max_new_tokens, self.system_prompt
+                    )
+            else:
+                with recording(self.perf):
+                    results = [
+                        solver._generate(pending_prompt, self.temperature, self.max_new_tokens,
+                                         self.system_prompt)
+                        for pending_prompt in self.pending
+                    ]
+            self.advance(results)
+            yield from self.drain_events()
+        yield ResultEvent(self.analysis() if self.problem is not None else self.result())
+
+    def _stream_generation(self, prompt: str) -> Iterator[TokenEvent]:
+        """
+        Generate one prompt on a worker thread, yielding TokenEvents.
+
+        Returns the GenerationResult as the generator's return value.
+        """
+        from transformers import TextIteratorStreamer
+        
+        streamer = TextIteratorStreamer(self.solver.tokenizer, skip_prompt=True,
+                                        skip_special_tokens=True)
+        outcome = {}
+        
+        def generate() -> None:
+            try:
+                with recording(self.perf):
+                    outcome['result'] = self.solver._generate(
+                        prompt, self.temperature, self.max_new_tokens, self.system_prompt,
+                        streamer=streamer
+                    )
+            except BaseException as error:
+                outcome['error'] = error
+                streamer.end()
+        
+        worker = threading.Thread(target=generate, daemon=True)
+        worker.start()
+        for text in streamer:
+            if text:
+                yield TokenEvent(text)
+        worker.join()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+    def run(self) -> Dict:
+        """Drive the session to completion against the solver's shared model."""
+        for _ in self.iter_events():
+            pass
+        return self.result()
+
+    def analysis(self) -> Dict:
+        """Return the solve()-style analysis of a finished problem session."""
+        return self.solver._analyze_result(self.problem, self.domain, self.result())
+
+    def result(self) -> Dict:
+        """Return the reflection result in the format of generate_with_reflection()."""
+        return {
+            'final_solution': self.current_solution,
+            'step_history': self.quantum_states.to_array(),
+            'final_steps': self.current_steps,
+            'convergence_history': list(self.convergence_history),
+            'converged_steps': self.step_convergence.converged_step_numbers(),
+            'iterations_needed': self.iterations_needed,
+            'prompt_tokens': sum(gen.prompt_tokens for gen in self.generations),
+            'completion_tokens': sum(gen.completion_tokens for gen in self.generations),
+            'perf': self.perf.report()
+        }
+
 
 class GeneralQuantumSolver:
+    # Quantum analysis settings live on the analyzer
+    dimension = _analyzer_attribute('dimension')
+    evolution_time = _analyzer_attribute('evolution_time')
+    fold_tokens = _analyzer_attribute('fold_tokens')
+    hamiltonian = _analyzer_attribute('hamiltonian')
+    state_cache = _analyzer_attribute('state_cache')
+    stability_window = _analyzer_attribute('stability_window')
+    stability_threshold = _analyzer_attribute('stability_threshold')
+
     def __init__(self, 
                  model_path: str = "unsloth/Meta-Llama-3.1-8B-Instruct", 
                  dimension: int = 512,
-                 domain: Optional[str] = None):
+                 domain: Optional[str] = None,
+                 hamiltonian: Union[None, str, HamiltonianFamily] = None,
+                 state_cache_entries: Optional[int] = 4096,
+                 state_cache_bytes: Optional[int] = 64 * 1024 * 1024,
+                 model: Optional[Any] = None,
+                 tokenizer: Optional[Any] = None):
         """
         Initialize the general quantum problem solver.
         
@@ -20,34 +476,128 @@ class GeneralQuantumSolver:
             model_path: Path to the language model to use
             dimension: Dimension of the quantum state space
             domain: Optional specific mathematical domain (e.g., "algebra", "calculus", "number_theory")
+            hamiltonian: Hamiltonian family name or instance (defaults to the ring coupling)
+            state_cache_entries: Maximum number of memoized quantum states (None for unbounded)
+            state_cache_bytes: Maximum total size of memoized quantum states (None for unbounded)
+            model: Already loaded causal language model to use instead of loading model_path
+            tokenizer: Already loaded tokenizer to use instead of loading model_path
+
+        The tokenizer is loaded on first use and the model on the first generation (or by
+        ``load()``), so constructing a solver is cheap. The quantum scoring is done by
+        ``self.analyzer``, which needs only the tokenizer.
         """
-        self.dimension = dimension
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model_path = model_path
         self.domain = domain
         
-        # Load model components
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=True)
-        self.model = LlamaForCausalLM.from_pretrained(model_path, device_map="auto")
+        # Tokenizer, quantum state encoding and evolution, and the state cache
+        self.analyzer = QuantumStateAnalyzer(
+            self._prepare_tokenizer(tokenizer) if tokenizer is not None else model_path,
+            dimension=dimension, hamiltonian=hamiltonian,
+            state_cache_entries=state_cache_entries, state_cache_bytes=state_cache_bytes
+        )
+        
+        # Model, loaded lazily unless passed in
+        self._model = model
+        self._device = None
+        self._load_lock = threading.Lock()
         
-        # Quantum components
-        self.quantum_state = np.zeros(dimension, dtype=complex)
+        # The model and tokenizer are shared by every session; generation and tokenizer
+        # calls are serialized so sessions on different threads can use them safely
+        self._generate_lock = threading.Lock()
+        self._tokenizer_lock = self.analyzer.tokenizer_lock
         
         # Solver parameters
         self.max_iterations = 5
         self.convergence_threshold = 0.98
-        self.stability_window = 3
-        self.stability_threshold = 0.001
+        # Fidelities a step must hold steady over before it is frozen
+        self.step_convergence_window = 3
+        # Decides whether an improved step replaces the current one; None keeps the initial steps
+        self.acceptance_policy: Optional[AcceptancePolicy] = AcceptancePolicy()
         
-        # Solution tracking
-        self.solution_history = []
-        self.convergence_history = []
-        self.solution_found = False
+        # History retention per solve (None keeps everything a solve produces)
+        self.convergence_history_size: Optional[int] = 256  # most recent step fidelities
+        # Iterations of step states to keep (None: max_iterations)
+        self.state_history_iterations: Optional[int] = None
+        self.batch_reflection = True  # reflect on all steps of an iteration in one generate call
+        self.use_prefix_cache = True  # reuse the system prompt's past-key-values across generations
+        self.max_prefix_caches = 8  # system prompts whose prefilled cache is kept
+        
+        # Prefilled system-prompt caches keyed by system prompt text, least recently used first
+        self._prefix_caches: "OrderedDict[str, Tuple[Any, Any]]" = OrderedDict()
+        
+        # When set, every solve() is run under cProfile and dumped to solve-<session>.prof here
+        self.profile_dir = os.environ.get("QUANTUM_PROFILE_DIR")
         
         # Initialize system prompt based on domain
         self._initialize_system_prompt()
 
+    @staticmethod
+    def _prepare_tokenizer(tokenizer: Any) -> Any:
+        # Batched generation pads on the left so every row ends at its last prompt token
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        return tokenizer
+
+    @property
+    def tokenizer(self) -> Any:
+        """The analyzer's tokenizer, loaded from ``model_path`` on first access."""
+        tokenizer = self.analyzer.tokenizer
+        if tokenizer.padding_side != "left" or tokenizer.pad_token is None:
+            self._prepare_tokenizer(tokenizer)
+        return tokenizer
+
+    @tokenizer.setter
+    def tokenizer(self, tokenizer: Any) -> None:
+        self.analyzer.tokenizer = self._prepare_tokenizer(tokenizer)
+        # Cached prefixes hold the old tokenizer's ids
+        self._prefix_caches.clear()
+
+    @property
+    def model(self) -> Any:
+        """The causal language model, loaded from ``model_path`` on first access."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from transformers import LlamaForCausalLM
+                    
+                    logger.info("Loading model %s", self.model_path)
+                    with timed('load_model'):
+                        self._model = LlamaForCausalLM.from_pretrained(self.model_path,
+                                                                       device_map="auto")
+        return self._model
+
+    @model.setter
+    def model(self, model: Any) -> None:
+        self._model = model
+        # Cached prefixes hold the old model's past-key-values
+        self._prefix_caches.clear()
+
+    @property
+    def device(self) -> "torch.device":
+        if self._device is None:
+            import torch
+            
+            self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        return self._device
+
+    def load(self) -> "GeneralQuantumSolver":
+        """Load the tokenizer and model now rather than on first use (e.g. before serving)."""
+        self.tokenizer
+        self.model
+        return self
+
+    def state_history_capacity(self, n_steps: int) -> int:
+        """Number of step states kept by a solve with ``n_steps`` steps (two iterations or more)."""
+        return state_history_capacity(n_steps, self.state_history_iterations,
+                                      self.max_iterations)
+
     def _initialize_system_prompt(self):
         """Initialize the system prompt based on the mathematical domain."""
+        self.system_prompt = self._build_system_prompt(self.domain)
+
+    def _build_system_prompt(self, domain: Optional[str]) -> str:
+        """Build the system prompt for a mathematical domain (None for general problems)."""
         base_prompt = """You are a precise mathematical problem solver. When solving problems:
 
 1. Break down the solution into clearly numbered steps
@@ -97,64 +647,37 @@ Additional Guidelines for Geometry:
 - Verify triangle inequalities when applicable"""
         }
 
-        self.system_prompt = base_prompt
-        if self.domain and self.domain.lower() in domain_guidelines:
-            self.system_prompt += "\n\n" + domain_guidelines[self.domain.lower()]
+        system_prompt = base_prompt
+        if domain and domain.lower() in domain_guidelines:
+            system_prompt += "\n\n" + domain_guidelines[domain.lower()]
+        return system_prompt
 
-    def check_solution_stability(self, current_solution: str) -> bool:
-        """Check if the solution has stabilized over recent iterations."""
-        if len(self.solution_history) < self.stability_window:
-            self.solution_history.append(current_solution)
-            return False
-            
-        # Compare with previous solutions
-        self.solution_history.append(current_solution)
-        recent_solutions = self.solution_history[-self.stability_window:]
-        
-        # Extract numerical values and key mathematical terms
-        def extract_key_elements(sol: str) -> set:
-            numbers = set(re.findall(r'-?\d*\.?\d+', sol))
-            math_terms = set(re.findall(r'[α-ω\+\-\*/\^\{\}\[\]]+', sol))
-            return numbers.union(math_terms)
-            
-        solution_elements = [extract_key_elements(sol) for sol in recent_solutions]
-        
-        # Check if solutions have stabilized
-        is_stable = all(
-            len(solution_elements[i].symmetric_difference(solution_elements[i-1])) / 
-            max(len(solution_elements[i]), 1) < self.stability_threshold
-            for i in range(1, len(solution_elements))
-        )
-        
-        # Remove oldest solution if window is full
-        if len(self.solution_history) > self.stability_window:
-            self.solution_history.pop(0)
-            
-        return is_stable
+    def stability_tracker(self) -> StabilityTracker:
+        """A fresh StabilityTracker with this solver's stability window and threshold."""
+        return self.analyzer.stability_tracker()
+
+    def check_solution_stability(
+        self, current_solution: str,
+        solution_history: Union[StabilityTracker, List[str], None] = None,
+    ) -> bool:
+        """Check if the solution has stabilized (see QuantumStateAnalyzer)."""
+        return self.analyzer.check_solution_stability(current_solution, solution_history)
 
     def extract_solution_steps(self, response: str) -> List[str]:
         """Extract individual solution steps from the response."""
-        steps = re.split(r'Step \d+[:.]\s+', response)[1:]
-        return [step.strip() for step in steps]
+        return self.analyzer.extract_solution_steps(response)
 
     def analyze_step_complexity(self, step: str) -> float:
         """Analyze the mathematical complexity of a solution step."""
-        # Count mathematical symbols and expressions
-        math_symbols = len(re.findall(r'[+\-*/^√∑∏∫∂θπ=≠≤≥∈∉⊆⊂∪∩]', step))
-        equations = len(re.findall(r'[^=]=[^=]', step))
-        variables = len(set(re.findall(r'[a-zA-Z]', step)))
-        
-        # Weight different components
-        complexity = (math_symbols * 0.4 + equations * 0.4 + variables * 0.2) / 100
-        return min(max(complexity, 0.1), 1.0)
+        return self.analyzer.analyze_step_complexity(step)
 
     def create_step_reflection_prompt(self, step: str, step_number: int, total_steps: int, 
-                                    quantum_state: np.ndarray) -> str:
+                                    quantum_state: np.ndarray,
+                                    system_prompt: Optional[str] = None) -> str:
         """Create a reflection prompt for a specific solution step."""
         step_complexity = self.analyze_step_complexity(step)
         
-        return f"""
-        {self.system_prompt}
+        return f"""{system_prompt or self.system_prompt}
 
         Please analyze and improve Step {step_number} of {total_steps}:
 
@@ -175,11 +698,11 @@ Additional Guidelines for Geometry:
         Provide an improved version of this step:
         Step {step_number}: """
 
-    def create_steps_integration_prompt(self, steps: List[str], quantum_state: np.ndarray) -> str:
+    def create_steps_integration_prompt(self, steps: List[str], quantum_state: np.ndarray,
+                                        system_prompt: Optional[str] = None) -> str:
         """Create a prompt for integrating multiple solution steps."""
         steps_text = "\n\n".join([f"Step {i+1}: {step}" for i, step in enumerate(steps)])
-        return f"""
-        {self.system_prompt}
+        return f"""{system_prompt or self.system_prompt}
 
         Review these solution steps:
 
@@ -197,207 +720,354 @@ Additional Guidelines for Geometry:
         Provide an improved integrated solution:
         """
 
-    def generate_with_reflection(self, prompt: str, max_new_tokens: int = 2000) -> Dict:
-        """Generate solution with quantum reflection."""
-        print("\n=== Starting Step-by-Step Mathematical Analysis ===")
-        print("\nInitial Prompt:")
-        print(prompt)
+    def _system_prefix_cache(self, system_prompt: str) -> Tuple["torch.Tensor", Any]:
+        """
+        Token ids and prefilled past-key-values of a system prompt.
+
+        Each is computed once and kept for the ``max_prefix_caches`` most recently used
+        system prompts.
+        """
+        import torch
         
-        # Initial solution generation
-        inputs = self.tokenizer.encode(prompt, return_tensors="pt").to(self.device)
-        
-        print("\nGenerating initial solution...")
-        with torch.no_grad():
-            outputs = self.model.generate(
-                inputs,
-                max_new_tokens=max_new_tokens,
-                num_return_sequences=1,
-                temperature=0.1,
-                do_sample=True
-            )
-        
-        initial_response = self.tokenizer.decode(outputs[0].cpu(), skip_special_tokens=True)
-        print("\nInitial Response:")
-        print(initial_response)
-        
-        current_steps = self.extract_solution_steps(initial_response)
-        print("\nExtracted Steps:")
-        for i, step in enumerate(current_steps, 1):
-            print(f"\nStep {i}:")
-            print(step)
-            complexity = self.analyze_step_complexity(step)
-            print(f"Step Complexity: {complexity:.3f}")
-        
-        improved_steps = []
-        quantum_states = []
-        consecutive_stable_iterations = 0
-        
-        for iteration in range(self.max_iterations):
-            print(f"\n=== Reflection Iteration {iteration + 1} ===")
-            
-            current_solution = " ".join(current_steps)
-            print("\nCurrent Complete Solution:")
-            print(current_solution)
-            
-            stability = self.check_solution_stability(current_solution)
-            print(f"\nSolution Stability Check: {'Stable' if stability else 'Not Stable'}")
-            
-            if stability:
-                consecutive_stable_iterations += 1
-                print(f"Consecutive stable iterations: {consecutive_stable_iterations}")
-                if consecutive_stable_iterations >= self.stability_window:
-                    print("\n=== Solution Stabilized ===")
-                    break
-            else:
-                consecutive_stable_iterations = 0
-            
-            print("\nProcessing individual steps:")
-            for i, step in enumerate(current_steps):
-                print(f"\nAnalyzing Step {i+1}:")
-                print("Original step:", step)
-                
-                current_state = self.apply_quantum_operation(step)
-                quantum_states.append(current_state)
-                print(f"Quantum state mean amplitude: {np.abs(current_state).mean():.4f}")
-                
-                reflection_prompt = self.create_step_reflection_prompt(
-                    step, i+1, len(current_steps), current_state
-                )
-                print("\nReflection Prompt:")
-                print(reflection_prompt)
-                
-                inputs = self.tokenizer.encode(reflection_prompt, return_tensors="pt").to(self.device)
-                with torch.no_grad():
-                    outputs = self.model.generate(
-                        inputs,
+        entry = self._prefix_caches.get(system_prompt)
+        if entry is None:
+            count('prefix_cache_misses')
+            with timed('tokenize'), self._tokenizer_lock:
+                prefix_ids = self.tokenizer(system_prompt, return_tensors="pt").input_ids
+                prefix_ids = prefix_ids.to(self.device)
+            with timed('prefill_prefix'), torch.no_grad():
+                past_key_values = self.model(prefix_ids, use_cache=True).past_key_values
+            entry = self._prefix_caches[system_prompt] = (prefix_ids, past_key_values)
+            while len(self._prefix_caches) > max(self.max_prefix_caches, 1):
+                self._prefix_caches.popitem(last=False)
+        else:
+            self._prefix_caches.move_to_end(system_prompt)
+            count('prefix_cache_hits')
+        return entry
+
+    def _encode_prompts(
+        self, prompts: List[str], system_prompt: Optional[str] = None
+    ) -> Tuple["torch.Tensor", "torch.Tensor", Any]:
+        """
+        Tokenize prompts for generation, returning (input_ids, attention_mask, past_key_values).
+
+        When every prompt starts with the system prompt, the cached system-prompt prefix is
+        reused so the model only prefills each prompt's own text. Padding is then placed
+        between the shared prefix and each suffix, keeping the cached prefix aligned across
+        the batch; otherwise prompts are simply left-padded and past_key_values is None.
+        """
+        import torch
+        
+        system_prompt = system_prompt or self.system_prompt
+        suffixes = [prompt[len(system_prompt):] for prompt in prompts]
+        suffix_ids = None
+        if self.use_prefix_cache and all(prompt.startswith(system_prompt) for prompt in prompts):
+            with timed('tokenize'), self._tokenizer_lock:
+                suffix_ids = self.tokenizer(suffixes, add_special_tokens=False)["input_ids"]
+        if not suffix_ids or not all(suffix_ids):
+            with timed('tokenize'), self._tokenizer_lock:
+                inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+            return inputs.input_ids, inputs.attention_mask, None
+        
+        prefix_ids, prefix_cache = self._system_prefix_cache(system_prompt)
+        width = max(len(ids) for ids in suffix_ids)
+        pad_id = self.tokenizer.pad_token_id
+        suffix = torch.tensor([[pad_id] * (width - len(ids)) + ids for ids in suffix_ids],
+                              device=self.device)
+        suffix_mask = torch.tensor(
+            [[0] * (width - len(ids)) + [1] * len(ids) for ids in suffix_ids], device=self.device
+        )
+        
+        batch_size = len(prompts)
+        input_ids = torch.cat([prefix_ids.expand(batch_size, -1), suffix], dim=-1)
+        prefix_mask = torch.ones_like(prefix_ids).expand(batch_size, -1)
+        attention_mask = torch.cat([prefix_mask, suffix_mask], dim=-1)
+        past_key_values = copy.deepcopy(prefix_cache)
+        if batch_size > 1:
+            past_key_values.batch_repeat_interleave(batch_size)
+        return input_ids, attention_mask, past_key_values
+
+    def _generate_batch(self, prompts: List[str], temperature: float, max_new_tokens: int,
+                        system_prompt: Optional[str] = None,
+                        streamer: Optional[Any] = None) -> List[GenerationResult]:
+        """
+        Generate completions for several prompts with a single model.generate call.
+
+        Prompts are left-padded with an attention mask so every row continues from its own
+        last prompt token. Only the newly generated tokens are decoded, so the echoed prompt
+        never ends up in the completion text; results are returned in prompt order.
+        """
+        if not prompts:
+            return []
+        import torch
+        
+        model = self.model
+        with span('generate', batch_size=len(prompts), temperature=temperature) as trace_fields:
+            with self._generate_lock:
+                input_ids, attention_mask, past_key_values = self._encode_prompts(prompts,
+                                                                                  system_prompt)
+                with timed('generate'), torch.no_grad():
+                    outputs = model.generate(
+                        input_ids,
+                        attention_mask=attention_mask,
+                        past_key_values=past_key_values,
                         max_new_tokens=max_new_tokens,
                         num_return_sequences=1,
-                        temperature=0.7,
-                        do_sample=True
+                        temperature=temperature,
+                        do_sample=True,
+                        pad_token_id=self.tokenizer.pad_token_id,
+                        streamer=streamer
                     )
-                
-                improved_step = self.tokenizer.decode(outputs[0].cpu(), skip_special_tokens=True)
-                improved_steps.append(improved_step)
-                
-                print("\nImproved step:")
-                print(improved_step)
-                
-                step_quantum_state = self.apply_quantum_operation(improved_step)
-                step_fidelity = self.measure_convergence(current_state, step_quantum_state)
-                self.convergence_history.append(step_fidelity)
-                
-                print(f"Step fidelity: {step_fidelity:.4f}")
-                
-                if len(self.convergence_history) >= 3:
-                    recent_convergence = self.convergence_history[-3:]
-                    print(f"Recent convergence history: {recent_convergence}")
-                    if (max(recent_convergence) - min(recent_convergence) < self.stability_threshold and
-                        np.mean(recent_convergence) > self.convergence_threshold):
-                        print(f"\n=== Step {i+1} Converged ===")
-                        continue
             
-            integration_state = self.apply_quantum_operation(" ".join(improved_steps))
-            print("\nIntegration state mean amplitude:", np.abs(integration_state).mean())
-            
-            if iteration > 0:
-                overall_convergence = self.measure_convergence(
-                    quantum_states[-len(current_steps):],
-                    quantum_states[-2*len(current_steps):-len(current_steps)]
-                )
-                
-                print(f"\nOverall convergence: {overall_convergence:.4f}")
-                
-                if (overall_convergence > self.convergence_threshold and 
-                    consecutive_stable_iterations >= self.stability_window - 1):
-                    print("\n=== Overall Solution Converged ===")
-                    break
-            
-            improved_steps = []
-        
-        print("\n=== Final Analysis Results ===")
-        print(f"Total iterations needed: {iteration + 1}")
-        print(f"Final convergence history: {self.convergence_history}")
-        print("\nFinal solution:")
-        print(current_solution)
-        
+            new_tokens = outputs[:, input_ids.shape[-1]:].cpu()
+            with timed('decode'), self._tokenizer_lock:
+                completions = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+            prompt_tokens = attention_mask.sum(dim=-1).tolist()
+            completion_tokens = (new_tokens != self.tokenizer.pad_token_id).sum(dim=-1).tolist()
+            count('prompt_tokens', sum(prompt_tokens))
+            count('completion_tokens', sum(completion_tokens))
+            trace_fields['prompt_tokens'] = sum(prompt_tokens)
+            trace_fields['completion_tokens'] = sum(completion_tokens)
+        logger.debug("Generated %d completions (%d prompt tokens, %d new tokens)",
+                     len(prompts), sum(prompt_tokens), sum(completion_tokens))
+        return [
+            GenerationResult(text, prompt_count, completion_count)
+            for text, prompt_count, completion_count
+            in zip(completions, prompt_tokens, completion_tokens)
+        ]
+
+    def _generate(self, prompt: str, temperature: float, max_new_tokens: int,
+                  system_prompt: Optional[str] = None,
+                  streamer: Optional[Any] = None) -> GenerationResult:
+        """Generate a completion for a single prompt."""
+        return self._generate_batch([prompt], temperature, max_new_tokens, system_prompt,
+                                    streamer)[0]
+
+    def generate_with_reflection(self, prompt: str, max_new_tokens: int = 2000,
+                                 system_prompt: Optional[str] = None) -> Dict:
+        """Generate solution with quantum reflection."""
+        return SolveSession(self, prompt, max_new_tokens, system_prompt).run()
+
+    def iter_reflection(self, prompt: str, max_new_tokens: int = 2000,
+                        system_prompt: Optional[str] = None,
+                        stream_tokens: bool = False) -> Iterator[ReflectionEvent]:
+        """
+        Streaming variant of generate_with_reflection().
+
+        Yields typed events as the loop progresses (see SolveSession.iter_events), ending
+        with a ResultEvent holding the generate_with_reflection() result.
+        """
+        session = SolveSession(self, prompt, max_new_tokens, system_prompt)
+        yield from session.iter_events(stream_tokens)
+
+    def solve_stream(self, problem: str, max_tokens: int = 2000, domain: Optional[str] = None,
+                     stream_tokens: bool = False) -> Iterator[ReflectionEvent]:
+        """
+        Streaming variant of solve().
+
+        Yields typed events as the loop progresses, ending with a ResultEvent holding the
+        solve() analysis. With ``stream_tokens`` the initial solution arrives as TokenEvents
+        while it is generated.
+        """
+        session = self.create_session(problem, domain, max_tokens)
+        yield from session.iter_events(stream_tokens)
+
+    def create_session(self, problem: str, domain: Optional[str] = None,
+                       max_tokens: int = 2000) -> SolveSession:
+        """
+        Create a solve session for one problem against this solver's shared model.
+
+        Args:
+            problem: Problem statement to solve
+            domain: Mathematical domain for this request (defaults to the solver's domain)
+            max_tokens: Maximum new tokens per generation
+
+        Returns:
+            A fresh SolveSession with its own histories
+        """
+        domain = domain if domain is not None else self.domain
+        system_prompt = self._build_system_prompt(domain)
+        return SolveSession(self, self._problem_prompt(problem, system_prompt), max_tokens,
+                            system_prompt, problem=problem, domain=domain)
+
+    def _problem_prompt(self, problem: str, system_prompt: Optional[str] = None) -> str:
+        return f"{system_prompt or self.system_prompt}\n\nProblem to solve:\n{problem}"
+
+    def _analyze_result(self, problem: str, domain: Optional[str], result: Dict) -> Dict:
+        """Build the analysis summary returned by solve() from a reflection result."""
         return {
-            'final_solution': current_solution,
-            'step_history': quantum_states,
-            'final_steps': current_steps,
-            'convergence_history': self.convergence_history,
-            'iterations_needed': iteration + 1
+            'problem': problem,
+            'solution': result['final_solution'],
+            'steps': result['final_steps'],
+            'convergence': result['convergence_history'],
+            'iterations': result['iterations_needed'],
+            'converged_steps': result['converged_steps'],
+            'domain': domain,
+            'complexity_scores': [
+                self.analyze_step_complexity(step) for step in result['final_steps']
+            ],
+            'prompt_tokens': result['prompt_tokens'],
+            'completion_tokens': result['completion_tokens'],
+            'perf': result['perf']
         }
 
-    def solve(self, problem: str, max_tokens: int = 2000) -> Dict:
+    def solve(self, problem: str, max_tokens: int = 2000, domain: Optional[str] = None) -> Dict:
         """
         Solve a mathematical problem using quantum-enhanced reflection.
+
+        Each call runs in its own SolveSession, so repeated or concurrent calls on one
+        solver do not share histories. The returned analysis includes a 'perf' report of
+        per-stage durations and call counts, token counts and cache hits for this solve;
+        set ``profile_dir`` (or QUANTUM_PROFILE_DIR) to also dump a cProfile of each solve.
         """
-        print("\n=== Starting Mathematical Problem Analysis ===")
-        print("\nProblem:", problem)
-        print("Domain:", self.domain if self.domain else "General")
+        domain = domain if domain is not None else self.domain
+        logger.info("Solving problem (domain: %s)", domain or "general")
+        logger.debug("Problem:\n%s", problem)
         
         # Initial solution generation
-        full_prompt = f"{self.system_prompt}\n\nProblem to solve:\n{problem}"
-        result = self.generate_with_reflection(full_prompt, max_tokens)
+        session = self.create_session(problem, domain, max_tokens)
+        profile_path = (os.path.join(self.profile_dir, f"solve-{session.session_id}.prof")
+                        if self.profile_dir else None)
+        with profiled(profile_path):
+            session.run()
         
         # Analysis summary
-        analysis = {
-            'problem': problem,
-            'solution': result['final_solution'],
-            'steps': result['final_steps'],
-            'convergence': result['convergence_history'],
-            'iterations': result['iterations_needed'],
-            'domain': self.domain,
-            'complexity_scores': [self.analyze_step_complexity(step) for step in result['final_steps']]
-        }
+        analysis = session.analysis()
         
-        print("\n=== Final Solution Analysis ===")
-        print("\nProblem:", problem)
-        print("\nDomain:", self.domain if self.domain else "General")
-        print("\nComplexity Analysis:")
-        for i, score in enumerate(analysis['complexity_scores'], 1):
-            print(f"Step {i} Complexity: {score:.3f}")
-        print(f"\nFinal Convergence Score: {analysis['convergence'][-1] if analysis['convergence'] else 'N/A'}")
-        print(f"Total Iterations: {analysis['iterations']}")
+        logger.info("Solved in %d iterations; final convergence %s", analysis['iterations'],
+                    analysis['convergence'][-1] if analysis['convergence'] else 'N/A')
+        logger.debug("Step complexities: %s", analysis['complexity_scores'])
         
-        return analysis 
-    def apply_quantum_operation(self, text: str) -> np.ndarray:
-        """Apply quantum operations to analyze solution quality."""
-        tokens = self.tokenizer.encode(text)
-        features = np.zeros(self.dimension, dtype=complex)
+        return analysis
+
+    def solve_many(self, problems: List[str], domain: Optional[str] = None, max_tokens: int = 2000,
+                   batch_size: int = 8) -> Dict:
+        """
+        Solve many problems, batching generations across problems.
+
+        Every problem gets its own SolveSession. Pending generations from all sessions go into
+        one work queue and are drained in batches of up to ``batch_size`` prompts, so initial
+        solutions and reflection rounds of different problems share model.generate calls and
+        the model keeps running full batches while individual problems progress at their own
+        pace.
+
+        Args:
+            problems: Problem statements to solve
+            domain: Mathematical domain for all problems (defaults to the solver's domain)
+            max_tokens: Maximum new tokens per generation
+            batch_size: Maximum number of prompts per model.generate call
+
+        Returns:
+            Dict with 'results' (one solve()-style analysis per problem, in input order) and
+            'throughput' (elapsed time, problems/sec, tokens/sec and a 'perf' report). Shared
+            batched generations are reported in the throughput perf report, not per problem.
+        """
+        batch_perf = PerfRecorder()
+        start_time = time.perf_counter()
+        domain = domain if domain is not None else self.domain
+        sessions = [self.create_session(problem, domain, max_tokens) for problem in problems]
+        system_prompt = sessions[0].system_prompt if sessions else self.system_prompt
+        
+        queue = deque()
+        received = {}
+        
+        def enqueue(session: SolveSession) -> None:
+            received[id(session)] = [None] * len(session.pending)
+            queue.extend((session, slot) for slot in range(len(session.pending)))
         
-        for i, token in enumerate(tokens[:self.dimension]):
-            amplitude = token / self.tokenizer.vocab_size
-            phase = np.exp(2j * np.pi * (i / self.dimension))
-            features[i % self.dimension] = amplitude * phase
+        for session in sessions:
+            if not session.done:
+                enqueue(session)
+        
+        while queue:
+            # Fill the batch with the oldest requests that share a sampling temperature
+            temperature = queue[0][0].temperature
+            batch, deferred = [], []
+            while queue and len(batch) < batch_size:
+                item = queue.popleft()
+                (batch if item[0].temperature == temperature else deferred).append(item)
+            queue.extendleft(reversed(deferred))
             
-        features = features / np.linalg.norm(features)
+            with recording(batch_perf):
+                results = self._generate_batch(
+                    [session.pending[slot] for session, slot in batch], temperature, max_tokens,
+                    system_prompt
+                )
+            for (session, slot), result in zip(batch, results):
+                slots = received[id(session)]
+                slots[slot] = result
+                if all(slot_result is not None for slot_result in slots):
+                    session.advance(slots)
+                    if not session.done:
+                        enqueue(session)
+        
+        elapsed = time.perf_counter() - start_time
+        results = [session.analysis() for session in sessions]
+        prompt_tokens = sum(result['prompt_tokens'] for result in results)
+        completion_tokens = sum(result['completion_tokens'] for result in results)
+        throughput = {
+            'problems': len(problems),
+            'elapsed_seconds': elapsed,
+            'problems_per_second': len(problems) / elapsed if elapsed > 0 else 0.0,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'tokens_per_second': ((prompt_tokens + completion_tokens) / elapsed
+                                  if elapsed > 0 else 0.0),
+            'completion_tokens_per_second': completion_tokens / elapsed if elapsed > 0 else 0.0
+        }
+        batch_perf.stop()
         
-        H = self.create_hamiltonian()
-        U = expm(-1j * H)
-        evolved_state = U @ features
+        logger.info("Solved %d problems in %.2fs "
+                    "(%.3f problems/s, %.1f tokens/s, %.1f generated tokens/s)",
+                    throughput['problems'], elapsed, throughput['problems_per_second'],
+                    throughput['tokens_per_second'], throughput['completion_tokens_per_second'])
+        trace('solve_many', **throughput)
+        throughput['perf'] = batch_perf.report()
         
-        return evolved_state
+        return {'results': results, 'throughput': throughput}
+
+    @property
+    def evolution_engine(self) -> EvolutionEngine:
+        """Shared evolution engine for this solver's Hamiltonian, dimension and time."""
+        return self.analyzer.evolution_engine
+
+    def encode_quantum_features(self, text: str) -> np.ndarray:
+        """Encode text as a normalized (unevolved) quantum feature state."""
+        return self.analyzer.encode_quantum_features(text)
+
+    def state_cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size of the quantum state cache."""
+        return self.analyzer.state_cache_stats()
+
+    def apply_quantum_operation(self, text: str) -> np.ndarray:
+        """Apply quantum operations to analyze solution quality."""
+        return self.analyzer.apply_quantum_operation(text)
+
+    def apply_quantum_operation_batch(self, texts: List[str]) -> np.ndarray:
+        """Apply quantum operations to many texts at once; see QuantumStateAnalyzer."""
+        return self.analyzer.apply_quantum_operation_batch(texts)
+
+    def quantum_trajectory(self, text: str,
+                           times: Union[float, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Evolve the encoded text to several evolution times at once."""
+        return self.analyzer.quantum_trajectory(text, times)
 
     def create_hamiltonian(self) -> np.ndarray:
         """Create the Hamiltonian operator for quantum evolution."""
-        H = np.zeros((self.dimension, self.dimension), dtype=complex)
-        for i in range(self.dimension):
-            for j in range(self.dimension):
-                if i != j:
-                    distance = min(abs(i - j), self.dimension - abs(i - j))
-                    coupling = 1.0 / (1.0 + distance)
-                    H[i, j] = coupling * np.exp(1j * np.pi * distance / self.dimension)
-        H = (H + H.conj().T) / 2
-        return H
+        return self.analyzer.create_hamiltonian()
 
     def measure_convergence(self, prev_state: np.ndarray, current_state: np.ndarray) -> float:
         """Measure the convergence between quantum states."""
-        fidelity = np.abs(np.vdot(prev_state, current_state)) ** 2
-        return float(fidelity)
+        return self.analyzer.measure_convergence(prev_state, current_state)
+
+    def measure_block_convergence(self, prev_states: np.ndarray,
+                                  current_states: np.ndarray) -> BlockFidelity:
+        """Measure the per-step and aggregate convergence between two blocks of step states."""
+        return self.analyzer.measure_block_convergence(prev_states, current_states)
 
 def main():
     # Example usage with detailed output
+    configure_logging()
     solver = GeneralQuantumSolver(domain="algebra")
     
     problem = """
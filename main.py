@@ -1,37 +1,65 @@
 import numpy as np
-from transformers import AutoTokenizer, LlamaForCausalLM
-import torch
-from scipy.linalg import expm
-from typing import List, Tuple, Dict
-import nltk
-from nltk.tokenize import sent_tokenize
+from typing import Any, Deque, List, Tuple, Dict, Optional, Union
 import re
-nltk.download('punkt')
+import logging
+import os
+from collections import deque
+from analysis import (AcceptancePolicy, StabilityTracker, StepConvergenceTracker,
+                      accept_improvement, extract_key_elements, reflected_step,
+                      state_history_capacity)
+from perf import PerfRecorder, count, profiled, recording, timed
+from quantum_ops import (HamiltonianFamily, StateRingBuffer, block_fidelity, encode_token_batch,
+                         get_evolution_engine, make_hamiltonian)
+from tracing import configure_logging, get_logger, span, trace
+
+logger = get_logger("main")
+
+_STEP_PATTERN = re.compile(r'Step \d+[:.]\s+')
+_ALPHA_PATTERN = re.compile(r'alpha\s*=\s*(\d+)')
+
+
+def _alpha_key_elements(solution: str) -> frozenset:
+    """Key elements of a solution plus its "alpha = X" integer values."""
+    return extract_key_elements(solution).union(_ALPHA_PATTERN.findall(solution.lower()))
+
 
 class QuantumReflectionSystem:
-    def __init__(self, model_path: str = "unsloth/Meta-Llama-3.1-8B-Instruct", dimension: int = 512):
+    def __init__(self, model_path: str = "unsloth/Meta-Llama-3.1-8B-Instruct", dimension: int = 512,
+                 hamiltonian: Union[None, str, HamiltonianFamily] = None):
+        self.model_path = model_path
         self.dimension = dimension
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         
-        # Load model components
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=True)
-        self.model = LlamaForCausalLM.from_pretrained(model_path, device_map="auto")
+        # Model components, loaded on first use
+        self._tokenizer = None
+        self._model = None
+        self._device = None
         
         # Quantum components
-        self.quantum_state = np.zeros(dimension, dtype=complex)
+        self.evolution_time = 1.0
+        # Fold tokens beyond `dimension` into the state instead of truncating
+        self.fold_tokens = False
+        self.hamiltonian = make_hamiltonian(hamiltonian)
         
         # Enhanced convergence parameters
         self.max_iterations = 5  
         self.convergence_threshold = 0.98
         self.stability_window = 3
         self.stability_threshold = 0.001
+        # Consecutive steady reflection fidelities that freeze a step
+        self.step_convergence_window = 3
+        # Gate for reflected steps (see analysis.AcceptancePolicy); None rejects them all
+        self.acceptance_policy: Optional[AcceptancePolicy] = AcceptancePolicy()
         
-        # Track solution history
-        self.solution_history = []
-        self.convergence_history = []
+        # History retention per problem (None keeps everything a problem produces)
+        self.convergence_history_size: Optional[int] = 256  # most recent step fidelities
+        # Step-state retention in iterations; None keeps one per reflection iteration
+        self.state_history_iterations: Optional[int] = None
         
-        # Solution found flag
-        self.solution_found = False
+        # Solution and convergence histories and the solution found flag, reset per problem
+        self.reset_history()
+        
+        # When set, generate_with_step_reflection() is run under cProfile and dumped here
+        self.profile_dir = os.environ.get("QUANTUM_PROFILE_DIR")
         
         # Mathematical system prompt
         self.system_prompt = """You are a precise mathematical problem solver with expertise in various mathematical domains. When solving problems:
@@ -54,55 +82,68 @@ For each step:
 Important to remember just use abstract and symbolic reasoning nothing more nothing less.
 """
 
-    def check_solution_stability(self, current_solution: str) -> bool:
-        if len(self.solution_history) < self.stability_window:
-            self.solution_history.append(current_solution)
-            return False
+    @property
+    def tokenizer(self) -> Any:
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
             
-        # Compare with previous solutions
-        self.solution_history.append(current_solution)
-        recent_solutions = self.solution_history[-self.stability_window:]
-        
-        # Extract numerical values and key mathematical terms
-        def extract_key_elements(sol: str) -> set:
-            numbers = set(re.findall(r'-?\d*\.?\d+', sol))
-            math_terms = set(re.findall(r'[α-ω\+\-\*/\^\{\}\[\]]+', sol))
-            # Also check for "alpha = X" pattern where X is an integer
-            alpha_values = set(re.findall(r'alpha\s*=\s*(\d+)', sol.lower()))
-            return numbers.union(math_terms).union(alpha_values)
+            with timed('load_tokenizer'):
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_path, use_fast=True)
+        return self._tokenizer
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            from transformers import LlamaForCausalLM
             
-        solution_elements = [extract_key_elements(sol) for sol in recent_solutions]
+            logger.info("Loading model %s", self.model_path)
+            with timed('load_model'):
+                self._model = LlamaForCausalLM.from_pretrained(self.model_path, device_map="auto")
+        return self._model
+
+    @property
+    def device(self) -> Any:
+        if self._device is None:
+            import torch
+            
+            self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        return self._device
+
+    def reset_history(self) -> None:
+        """Drop the histories of the previous problem; called at the start of every solve."""
+        self.solution_history = StabilityTracker(self.stability_window, self.stability_threshold,
+                                                 key_elements=_alpha_key_elements)
+        self.alpha_history: Deque[Tuple[bool, Optional[str]]] = deque(maxlen=self.stability_window)
+        self.convergence_history: Deque[float] = deque(maxlen=self.convergence_history_size)
+        self.solution_found = False
+        self.quantum_state = np.zeros(self.dimension, dtype=complex)
+
+    def check_solution_stability(self, current_solution: str) -> bool:
+        # Each solution is scanned once: its key elements go to the tracker and its alpha
+        # assignment is cached alongside the window
+        lowered = current_solution.lower()
+        alpha_values = _ALPHA_PATTERN.findall(lowered)
+        self.alpha_history.append(('alpha' in lowered and '=' in current_solution,
+                                   alpha_values[0] if alpha_values else None))
+        is_stable = self.solution_history.update(current_solution)
+        if not self.solution_history.ready:
+            return False
         
         # Check if alpha value is consistently present
-        alpha_found = all('alpha' in sol.lower() and '=' in sol for sol in recent_solutions)
+        alpha_found = all(has_alpha for has_alpha, _ in self.alpha_history)
         
         # Additional check for conclusive alpha value
         if alpha_found:
-            alpha_values = []
-            for sol in recent_solutions:
-                matches = re.findall(r'alpha\s*=\s*(\d+)', sol.lower())
-                if matches:
-                    alpha_values.append(matches[0])
+            alpha_values = [value for _, value in self.alpha_history if value is not None]
             if len(set(alpha_values)) == 1:  # Same alpha value in consecutive solutions
                 self.solution_found = True
-                print(f"\n=== Found consistent alpha value: {alpha_values[0]} ===")
+                logger.info("Found consistent alpha value: %s", alpha_values[0])
         
-        # Check if solutions have stabilized
-        is_stable = all(
-            len(solution_elements[i].symmetric_difference(solution_elements[i-1])) / 
-            max(len(solution_elements[i]), 1) < self.stability_threshold
-            for i in range(1, len(solution_elements))
-        )
-        
-        # Remove oldest solution if window is full
-        if len(self.solution_history) > self.stability_window:
-            self.solution_history.pop(0)
-            
         return is_stable and alpha_found
 
     def extract_solution_steps(self, response: str) -> List[str]:
         """Extract individual solution steps from the response."""
-        steps = re.split(r'Step \d+[:.]\s+', response)[1:]
+        steps = _STEP_PATTERN.split(response)[1:]
         return [step.strip() for step in steps]
 
     def create_step_reflection_prompt(self, step: str, step_number: int, total_steps: int, 
@@ -153,159 +194,195 @@ Important to remember just use abstract and symbolic reasoning nothing more noth
         """
 
     def generate_with_step_reflection(self, prompt: str, max_new_tokens: int = 2000) -> Dict:
-        print("\n=== Starting Step-by-Step Mathematical Analysis ===")
+        """
+        Solve with step-by-step reflection.
+
+        The result includes a 'perf' report of per-stage durations and call counts plus
+        token counts; set ``profile_dir`` (or QUANTUM_PROFILE_DIR) to also dump a cProfile.
+        """
+        self.reset_history()
+        perf = PerfRecorder()
+        profile_path = (os.path.join(self.profile_dir, "generate_with_step_reflection.prof")
+                        if self.profile_dir else None)
+        with recording(perf), profiled(profile_path):
+            result = self._step_reflection_loop(prompt, max_new_tokens)
+        perf.stop()
+        result['perf'] = perf.report()
+        return result
+
+    def _generate_text(self, prompt: str, temperature: float, max_new_tokens: int) -> str:
+        import torch
         
-        # Initial solution generation
-        full_prompt = f"{self.system_prompt}\n\nProblem to solve:\n{prompt}"
-        inputs = self.tokenizer.encode(full_prompt, return_tensors="pt").to(self.device)
+        model = self.model
+        with timed('tokenize'):
+            inputs = self.tokenizer.encode(prompt, return_tensors="pt").to(self.device)
         
-        with torch.no_grad():
-            outputs = self.model.generate(
-                inputs,
-                max_new_tokens=max_new_tokens,
-                num_return_sequences=1,
-                temperature=0.1,
-                do_sample=True
-            )
+        with span('generate', batch_size=1, temperature=temperature), timed('generate'):
+            with torch.no_grad():
+                outputs = model.generate(
+                    inputs,
+                    max_new_tokens=max_new_tokens,
+                    num_return_sequences=1,
+                    temperature=temperature,
+                    do_sample=True
+                )
+        count('prompt_tokens', inputs.shape[-1])
+        count('completion_tokens', outputs.shape[-1] - inputs.shape[-1])
+        
+        # Only the completion is decoded, not the echoed prompt
+        with timed('decode'):
+            return self.tokenizer.decode(outputs[0, inputs.shape[-1]:].cpu(),
+                                         skip_special_tokens=True)
+
+    def _step_reflection_loop(self, prompt: str, max_new_tokens: int) -> Dict:
+        logger.info("Starting step-by-step analysis")
         
-        initial_response = self.tokenizer.decode(outputs[0].cpu(), skip_special_tokens=True)
-        current_steps = self.extract_solution_steps(initial_response)
+        # Initial solution generation
+        full_prompt = f"{self.system_prompt}\n\nProblem to solve:\n{prompt}"
+        initial_response = self._generate_text(full_prompt, 0.1, max_new_tokens)
+        with timed('extract_steps'):
+            current_steps = self.extract_solution_steps(initial_response)
         
-        print("\n=== Initial Solution Steps ===")
-        print("Initial Response:", initial_response)
-        print("\nExtracted Steps:")
-        for i, step in enumerate(current_steps):
-            print(f"\nStep {i+1}:")
-            print(step)
+        logger.debug("Initial response:\n%s", initial_response)
+        logger.info("Extracted %d steps", len(current_steps))
+        trace('initial_solution', steps=len(current_steps))
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, step in enumerate(current_steps):
+                logger.debug("Step %d:\n%s", i + 1, step)
         
         improved_steps = []
-        quantum_states = []
+        capacity = state_history_capacity(len(current_steps), self.state_history_iterations,
+                                          self.max_iterations)
+        quantum_states = StateRingBuffer(capacity, self.dimension)
         consecutive_stable_iterations = 0
+        step_convergence = StepConvergenceTracker(len(current_steps),
+                                                  self.step_convergence_window,
+                                                  self.stability_threshold,
+                                                  self.convergence_threshold)
         
         for iteration in range(self.max_iterations):
-            print(f"\n=== Reflection Iteration {iteration + 1} ===")
+            logger.info("Reflection iteration %d", iteration + 1)
             
             current_solution = " ".join(current_steps)
-            print("\nCurrent Complete Solution:")
-            print(current_solution)
+            logger.debug("Current complete solution:\n%s", current_solution)
             
-            if self.check_solution_stability(current_solution):
+            with timed('stability_check'):
+                stability = self.check_solution_stability(current_solution)
+            if stability:
                 consecutive_stable_iterations += 1
-                print(f"\nSolution stability detected! Consecutive stable iterations: {consecutive_stable_iterations}")
-                if consecutive_stable_iterations >= self.stability_window:
-                    print("\n=== Solution Stabilized ===")
-                    break
             else:
                 consecutive_stable_iterations = 0
-                print("\nSolution not yet stable")
+            logger.info("Solution %s (consecutive stable iterations: %d)",
+                        'stable' if stability else 'not stable', consecutive_stable_iterations)
+            trace('stability_check', iteration=iteration + 1, stable=stability,
+                  consecutive_stable_iterations=consecutive_stable_iterations)
+            if stability and consecutive_stable_iterations >= self.stability_window:
+                logger.info("Solution stabilized")
+                break
             
             if self.solution_found:
-                print("\n=== Exact Solution Found ===")
+                logger.info("Exact solution found")
+                break
+            
+            if step_convergence.all_converged:
+                logger.info("All %d steps converged", len(current_steps))
                 break
             
             for i, step in enumerate(current_steps):
-                print(f"\nProcessing Step {i+1}:")
-                print("Original step:", step)
-                
                 current_state = self.apply_quantum_operation(step)
                 quantum_states.append(current_state)
+                if step_convergence.converged[i]:
+                    improved_steps.append(step)
+                    continue
+                logger.debug("Processing step %d:\n%s", i + 1, step)
                 
                 reflection_prompt = self.create_step_reflection_prompt(
                     step, i+1, len(current_steps), current_state
                 )
                 
-                inputs = self.tokenizer.encode(reflection_prompt, return_tensors="pt").to(self.device)
-                with torch.no_grad():
-                    outputs = self.model.generate(
-                        inputs,
-                        max_new_tokens=max_new_tokens,
-                        num_return_sequences=1,
-                        temperature=0.7,
-                        do_sample=True
-                    )
-                
-                improved_step = self.tokenizer.decode(outputs[0].cpu(), skip_special_tokens=True)
-                improved_steps.append(improved_step)
-                
-                print("Improved step:", improved_step)
+                improved_step = reflected_step(
+                    self._generate_text(reflection_prompt, 0.7, max_new_tokens)
+                )
                 
                 step_quantum_state = self.apply_quantum_operation(improved_step)
-                step_fidelity = self.measure_convergence(current_state, step_quantum_state)
+                with timed('convergence'):
+                    step_fidelity = self.measure_convergence(current_state, step_quantum_state)
                 self.convergence_history.append(step_fidelity)
                 
-                print(f"Step fidelity: {step_fidelity:.4f}")
+                accepted = accept_improvement(self.acceptance_policy, step, improved_step,
+                                              step_fidelity)
+                improved_steps.append(improved_step if accepted else step)
+                
+                logger.debug("Improved step %d (fidelity %.4f, %s):\n%s", i + 1, step_fidelity,
+                             'accepted' if accepted else 'rejected', improved_step)
+                trace('step_improved', iteration=iteration + 1, step_number=i + 1,
+                      fidelity=step_fidelity, accepted=accepted)
                 
-                if len(self.convergence_history) >= 3:
-                    recent_convergence = self.convergence_history[-3:]
-                    print(f"Recent convergence history: {recent_convergence}")
-                    if (max(recent_convergence) - min(recent_convergence) < self.stability_threshold and
-                        np.mean(recent_convergence) > self.convergence_threshold):
-                        print(f"\n=== Step {i+1} Converged ===")
-                        continue
+                if step_convergence.update(i, step_fidelity):
+                    logger.info("Step %d converged (recent fidelities %s)",
+                                i + 1, list(step_convergence.fidelities[i]))
+                    trace('step_converged', iteration=iteration + 1, step_number=i + 1)
             
-            integration_state = self.apply_quantum_operation(" ".join(improved_steps))
-            if iteration > 0:
-                overall_convergence = self.measure_convergence(
-                    quantum_states[-len(current_steps):],
-                    quantum_states[-2*len(current_steps):-len(current_steps)]
-                )
+            current_steps = improved_steps
+            current_solution = " ".join(current_steps)
+            self.quantum_state = self.apply_quantum_operation(current_solution)
+            
+            # The newest n_steps states are this iteration's steps, the n_steps before the last
+            n_steps = len(current_steps)
+            if iteration > 0 and n_steps:
+                with timed('convergence'):
+                    block = block_fidelity(quantum_states.last(n_steps, skip=n_steps),
+                                           quantum_states.last(n_steps))
+                overall_convergence = block.mean
                 
-                print(f"\nOverall convergence: {overall_convergence:.4f}")
+                logger.info("Overall convergence: %.4f (min step %.4f, trace distance %.4f)",
+                            overall_convergence, block.min, block.trace_distance)
+                trace('iteration_complete', iteration=iteration + 1,
+                      overall_convergence=overall_convergence)
                 
                 if (overall_convergence > self.convergence_threshold and 
                     consecutive_stable_iterations >= self.stability_window - 1):
-                    print("\n=== Overall Solution Converged ===")
+                    logger.info("Overall solution converged")
                     break
             
             improved_steps = []
         
-        print("\n=== Final Analysis Results ===")
-        print(f"Total iterations needed: {iteration + 1}")
-        print(f"Final convergence history: {self.convergence_history}")
-        print("\nFinal solution:")
-        print(current_solution)
+        logger.info("Finished after %d iterations", iteration + 1)
+        logger.debug("Final convergence history: %s\nFinal solution:\n%s",
+                     list(self.convergence_history), current_solution)
+        trace('session_finished', iterations=iteration + 1)
         
         return {
             'final_solution': current_solution,
-            'step_history': quantum_states,
+            'step_history': quantum_states.to_array(),
             'final_steps': current_steps,
-            'convergence_history': self.convergence_history,
+            'convergence_history': list(self.convergence_history),
+            'converged_steps': step_convergence.converged_step_numbers(),
             'iterations_needed': iteration + 1
         }
 
     def apply_quantum_operation(self, text: str) -> np.ndarray:
-        tokens = self.tokenizer.encode(text)
-        features = np.zeros(self.dimension, dtype=complex)
-        
-        for i, token in enumerate(tokens[:self.dimension]):
-            amplitude = token / self.tokenizer.vocab_size
-            phase = np.exp(2j * np.pi * (i / self.dimension))
-            features[i % self.dimension] = amplitude * phase
-            
-        features = features / np.linalg.norm(features)
+        with timed('quantum_encode'):
+            tokens = self.tokenizer.encode(text)
+            features = encode_token_batch([tokens], self.dimension, self.tokenizer.vocab_size,
+                                          fold=self.fold_tokens)[0]
         
-        H = self.create_hamiltonian()
-        U = expm(-1j * H)
-        evolved_state = U @ features
+        with timed('evolve'):
+            engine = get_evolution_engine(self.hamiltonian, self.dimension, self.evolution_time)
+            evolved_state = engine.apply(features)
         
         return evolved_state
 
     def create_hamiltonian(self) -> np.ndarray:
-        H = np.zeros((self.dimension, self.dimension), dtype=complex)
-        for i in range(self.dimension):
-            for j in range(self.dimension):
-                if i != j:
-                    distance = min(abs(i - j), self.dimension - abs(i - j))
-                    coupling = 1.0 / (1.0 + distance)
-                    H[i, j] = coupling * np.exp(1j * np.pi * distance / self.dimension)
-        H = (H + H.conj().T) / 2
-        return H
+        with timed('create_hamiltonian'):
+            return self.hamiltonian.build(self.dimension)
 
     def measure_convergence(self, prev_state: np.ndarray, current_state: np.ndarray) -> float:
         fidelity = np.abs(np.vdot(prev_state, current_state)) ** 2
         return float(fidelity)
 
 def main():
+    configure_logging()
     system = QuantumReflectionSystem()
     
     prompt = '''
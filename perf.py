@@ -0,0 +1,144 @@
+"""
+Hot-path timers and counters for the quantum reflection solvers.
+
+Solver stages (tokenization, generation, decoding, quantum evolution, stability checks, ...)
+are wrapped in ``timed(stage)`` and report into the PerfRecorder that is active in the
+current context. A solve activates its own recorder, so every solve gets a report of where
+its wall time went even when several solves share one solver on different threads. With
+no active recorder ``timed`` and ``count`` do nothing beyond a context-variable lookup.
+
+``profiled`` runs a block under cProfile for deeper dives; stage names double as function
+names in the solvers (``_generate_batch``, ``check_solution_stability``, ...), so the same
+breakdown shows up in cProfile or py-spy output.
+"""
+import cProfile
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from tracing import get_logger
+
+logger = get_logger("perf")
+
+_active: ContextVar[Optional["PerfRecorder"]] = ContextVar("perf_recorder", default=None)
+# Held while a cProfile profiler is enabled; only one can be active per process (3.12+)
+_profile_lock = threading.Lock()
+
+
+class PerfRecorder:
+    """Accumulates wall time and call counts per stage, plus named counters."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._stopped: Optional[float] = None
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def add_stages(self, stages: Dict[str, Dict]) -> None:
+        """Add the 'stages' section of another recorder's report, e.g. a shared batch's."""
+        with self._lock:
+            for stage, timing in stages.items():
+                self.seconds[stage] += timing['seconds']
+                self.calls[stage] += timing['calls']
+
+    def stop(self) -> None:
+        """Fix the end of the recorder's wall-clock interval."""
+        self._stopped = time.perf_counter()
+
+    def report(self) -> Dict:
+        """
+        Summarize the recorded stages.
+
+        Returns:
+            Dict with 'wall_seconds', 'stages' ({stage: {'seconds', 'calls'}}, slowest first)
+            and 'counters'
+        """
+        with self._lock:
+            stages = {
+                stage: {'seconds': self.seconds[stage], 'calls': self.calls[stage]}
+                for stage in sorted(self.seconds, key=self.seconds.get, reverse=True)
+            }
+            counters = dict(self.counters)
+        end = self._stopped if self._stopped is not None else time.perf_counter()
+        return {'wall_seconds': end - self._started, 'stages': stages, 'counters': counters}
+
+
+def current_recorder() -> Optional[PerfRecorder]:
+    return _active.get()
+
+
+@contextmanager
+def recording(recorder: Optional[PerfRecorder]) -> Iterator[Optional[PerfRecorder]]:
+    """Make ``recorder`` the active recorder for the block (None disables recording)."""
+    token = _active.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Add the block's wall time to ``stage`` of the active recorder, if any."""
+    recorder = _active.get()
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_time(stage, time.perf_counter() - start)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add to counter ``name`` of the active recorder, if any."""
+    recorder = _active.get()
+    if recorder is not None:
+        recorder.count(name, amount)
+
+
+@contextmanager
+def profiled(path: Optional[str]) -> Iterator[Optional[cProfile.Profile]]:
+    """
+    Run the block under cProfile and dump pstats-format stats to ``path``.
+
+    A None path profiles nothing, so callers can pass an optional setting straight through.
+    cProfile only follows the calling thread, and only one profiler can run at a time: while
+    another block is being profiled the block runs unprofiled and None is yielded.
+    """
+    if path is None:
+        yield None
+        return
+    if not _profile_lock.acquire(blocking=False):
+        logger.debug("Profiler already active; not profiling %s", path)
+        yield None
+        return
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            directory = os.path.dirname(os.path.expanduser(path))
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            profiler.dump_stats(os.path.expanduser(path))
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,619 @@
+"""Shared quantum-state utilities used by the reflection solvers."""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple, Type, Union
+
+import numpy as np
+
+from tracing import get_logger
+
+logger = get_logger("quantum_ops")
+
+DEFAULT_OPERATOR_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class ArrayCache:
+    """Thread-safe LRU cache of NumPy arrays bounded by entry count and total bytes."""
+
+    def __init__(self, max_bytes: Optional[int] = None, max_entries: Optional[int] = None):
+        """
+        Args:
+            max_bytes: Upper bound on the summed ``nbytes`` of cached arrays (None for unbounded)
+            max_entries: Upper bound on the number of cached arrays (None for unbounded)
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        """Return the cached array for ``key`` (marking it most recently used) or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def fits(self, value: np.ndarray) -> bool:
+        """Whether ``value`` fits the byte budget at all; larger arrays are never stored."""
+        return self.max_bytes is None or value.nbytes <= self.max_bytes
+
+    def put(self, key: Hashable, value: np.ndarray) -> None:
+        """Insert ``value``, evicting least recently used entries to respect the budget."""
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key).nbytes
+            if not self.fits(value):
+                return
+            self._entries[key] = value
+            self.nbytes += value.nbytes
+            self._evict()
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], np.ndarray]) -> np.ndarray:
+        """Return the cached array for ``key``, building and storing it on a miss."""
+        with self._lock:
+            value = self.get(key)
+            if value is None:
+                value = builder()
+                self.put(key, value)
+            return value
+
+    def clear(self) -> None:
+        """Drop every cached entry and reset the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _evict(self) -> None:
+        while self._entries and (
+            (self.max_bytes is not None and self.nbytes > self.max_bytes) or
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+
+@lru_cache(maxsize=32)
+def phase_table(dimension: int) -> np.ndarray:
+    """Return the read-only table exp(2 pi i k / dimension) for k in range(dimension)."""
+    table = np.exp(2j * np.pi * np.arange(dimension) / dimension)
+    table.setflags(write=False)
+    return table
+
+
+def encode_token_batch(token_ids: Sequence[Sequence[int]], dimension: int, vocab_size: int,
+                       fold: bool = False) -> np.ndarray:
+    """
+    Encode token id sequences as normalized quantum feature states.
+
+    Token ``i`` of a sequence becomes amplitude ``token / vocab_size`` with phase
+    ``exp(2 pi i / dimension)`` at position ``i % dimension``.
+
+    Args:
+        token_ids: One sequence of token ids per text
+        dimension: Dimension of the quantum state space
+        vocab_size: Tokenizer vocabulary size used to scale amplitudes
+        fold: If True, tokens beyond ``dimension`` are scatter-added onto position
+            ``i % dimension`` instead of being dropped
+
+    Returns:
+        Array of shape (len(token_ids), dimension) with unit-norm rows (all-zero rows
+        for empty inputs)
+    """
+    n_texts = len(token_ids)
+    limit = None if fold else dimension
+    lengths = np.fromiter((len(ids[:limit]) for ids in token_ids), dtype=np.intp, count=n_texts)
+    total = int(lengths.sum())
+    tokens = np.fromiter(chain.from_iterable(ids[:limit] for ids in token_ids),
+                         dtype=np.float64, count=total)
+    rows = np.repeat(np.arange(n_texts), lengths)
+    positions = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    if fold:
+        positions %= dimension
+
+    amplitudes = tokens / vocab_size * phase_table(dimension)[positions]
+    if fold:
+        flat_index = rows * dimension + positions
+        size = n_texts * dimension
+        features = (np.bincount(flat_index, weights=amplitudes.real, minlength=size) +
+                    1j * np.bincount(flat_index, weights=amplitudes.imag, minlength=size))
+        features = features.reshape(n_texts, dimension)
+    else:
+        features = np.zeros((n_texts, dimension), dtype=complex)
+        features[rows, positions] = amplitudes
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    np.divide(features, norms, out=features, where=norms > 0)
+    return features
+
+
+class HamiltonianFamily:
+    """
+    Base class for Hamiltonians used to evolve encoded solution states.
+
+    Subclasses set ``name``, store their parameters in ``self.params`` and implement
+    ``build``. The ``key`` identifies the Hamiltonian in operator and state caches.
+    """
+
+    name = "base"
+
+    def __init__(self, **params):
+        self.params = params
+
+    @property
+    def key(self) -> Tuple:
+        return (self.name,) + tuple(sorted(self.params.items()))
+
+    def build(self, dimension: int) -> np.ndarray:
+        """Return the dense (dimension x dimension) Hermitian matrix."""
+        raise NotImplementedError
+
+    def circulant_column(self, dimension: int) -> Optional[np.ndarray]:
+        """
+        Return the first column c of H when H[i, j] == c[(i - j) % dimension], else None.
+
+        Families that know they are circulant override this so evolution can use the FFT
+        without ever building the dense matrix.
+        """
+        return None
+
+    def __repr__(self) -> str:
+        params = ", ".join(f"{k}={v!r}" for k, v in sorted(self.params.items()))
+        return f"{type(self).__name__}({params})"
+
+
+HAMILTONIAN_FAMILIES: Dict[str, Type[HamiltonianFamily]] = {}
+
+
+def register_hamiltonian_family(cls: Type[HamiltonianFamily]) -> Type[HamiltonianFamily]:
+    """Class decorator making a Hamiltonian family available by name."""
+    HAMILTONIAN_FAMILIES[cls.name] = cls
+    return cls
+
+
+@register_hamiltonian_family
+class RingCouplingHamiltonian(HamiltonianFamily):
+    """
+    Ring-coupled Hamiltonian: sites i != j interact with strength 1 / (offset + distance)
+    and phase exp(i pi scale distance / d), where distance is measured around the ring.
+    """
+
+    name = "ring_coupling"
+
+    def __init__(self, coupling_offset: float = 1.0, phase_scale: float = 1.0):
+        super().__init__(coupling_offset=coupling_offset, phase_scale=phase_scale)
+
+    def profile(self, dimension: int) -> np.ndarray:
+        """Return the Hermitian-symmetrized matrix element for each ring distance."""
+        distance = np.arange(dimension // 2 + 1)
+        profile = (1.0 / (self.params["coupling_offset"] + distance) *
+                   np.exp(1j * np.pi * self.params["phase_scale"] * distance / dimension))
+        profile[0] = 0.0
+        # H[i, j] == H[j, i], so (H + H^dagger) / 2 reduces to the real part elementwise
+        return (profile + profile.conj()) / 2
+
+    def build(self, dimension: int) -> np.ndarray:
+        index = np.arange(dimension, dtype=np.int32)
+        distance = np.abs(np.subtract.outer(index, index))
+        np.minimum(distance, dimension - distance, out=distance)
+        return self.profile(dimension)[distance]
+
+    def circulant_column(self, dimension: int) -> np.ndarray:
+        offset = np.arange(dimension)
+        return self.profile(dimension)[np.minimum(offset, dimension - offset)]
+
+
+def make_hamiltonian(spec: Union[None, str, HamiltonianFamily] = None,
+                     **params) -> HamiltonianFamily:
+    """
+    Resolve a Hamiltonian specification.
+
+    Args:
+        spec: A registered family name, an existing instance, or None for the ring coupling
+        **params: Parameters forwarded to the family constructor when ``spec`` is a name
+
+    Returns:
+        A HamiltonianFamily instance
+    """
+    if isinstance(spec, HamiltonianFamily):
+        return spec
+    name = spec or RingCouplingHamiltonian.name
+    if name not in HAMILTONIAN_FAMILIES:
+        raise ValueError(f"Unknown Hamiltonian family {name!r}; "
+                         f"available: {sorted(HAMILTONIAN_FAMILIES)}")
+    return HAMILTONIAN_FAMILIES[name](**params)
+
+
+class OperatorCache(ArrayCache):
+    """
+    Process-wide cache of evolution operators U = exp(-i H t).
+
+    Operators are keyed by (dimension, evolution time, Hamiltonian key) so every solver
+    instance in the process shares them. When ``cache_dir`` is set, operators are also
+    written there as ``.npy`` files and loaded memory-mapped, so new workers start hot.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = DEFAULT_OPERATOR_CACHE_BYTES,
+                 cache_dir: Optional[str] = None):
+        super().__init__(max_bytes=max_bytes)
+        self.cache_dir = cache_dir
+
+    def get_operator(self, dimension: int, time: float, hamiltonian_key: Hashable,
+                     build_hamiltonian: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Return exp(-i H t) for the given Hamiltonian, computing it at most once.
+
+        Args:
+            dimension: Dimension of the quantum state space
+            time: Evolution time t
+            hamiltonian_key: Hashable description of the Hamiltonian family and parameters
+            build_hamiltonian: Callable returning the dense Hamiltonian on a cache miss
+
+        Returns:
+            The (dimension x dimension) unitary evolution operator
+        """
+        key = (int(dimension), float(time), hamiltonian_key)
+        return self.get_or_build(key, lambda: self._load_or_compute(key, build_hamiltonian))
+
+    def get_spectrum(self, dimension: int, hamiltonian_key: Hashable,
+                     build_hamiltonian: Callable[[], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the eigendecomposition of a Hermitian Hamiltonian, computing it at most once.
+
+        Args:
+            dimension: Dimension of the quantum state space
+            hamiltonian_key: Hashable description of the Hamiltonian family and parameters
+            build_hamiltonian: Callable returning the dense Hamiltonian on a cache miss
+
+        Returns:
+            Tuple of (eigenvalues, eigenvectors) as returned by ``np.linalg.eigh``
+        """
+        values_key = ("eigenvalues", int(dimension), hamiltonian_key)
+        vectors_key = ("eigenvectors", int(dimension), hamiltonian_key)
+        with self._lock:
+            eigenvalues, eigenvectors = self.get(values_key), self.get(vectors_key)
+            if eigenvalues is None or eigenvectors is None:
+                eigenvalues, eigenvectors = np.linalg.eigh(build_hamiltonian())
+                self.put(values_key, eigenvalues)
+                self.put(vectors_key, eigenvectors)
+            return eigenvalues, eigenvectors
+
+    def _path(self, key: Hashable) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"evolution_d{key[0]}_{digest}.npy")
+
+    def _load_or_compute(self, key: Hashable,
+                         build_hamiltonian: Callable[[], np.ndarray]) -> np.ndarray:
+        path = self._path(key) if self.cache_dir else None
+        if path and os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+
+        dimension, time, hamiltonian_key = key
+        # H is Hermitian, so exp(-iHt) = V diag(exp(-i lambda t)) V^dagger from one eigh
+        eigenvalues, eigenvectors = self.get_spectrum(dimension, hamiltonian_key, build_hamiltonian)
+        U = (eigenvectors * np.exp(-1j * time * eigenvalues)) @ eigenvectors.conj().T
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as handle:
+                np.save(handle, U)
+            os.replace(tmp_path, path)
+            return np.load(path, mmap_mode="r")
+        return U
+
+
+_operator_cache = OperatorCache(
+    max_bytes=int(os.environ.get("QUANTUM_OPERATOR_CACHE_BYTES", DEFAULT_OPERATOR_CACHE_BYTES)),
+    cache_dir=os.environ.get("QUANTUM_OPERATOR_CACHE_DIR") or None,
+)
+
+
+def get_operator_cache() -> OperatorCache:
+    """Return the process-wide evolution operator cache."""
+    return _operator_cache
+
+
+def configure_operator_cache(max_bytes: Optional[int] = None,
+                             cache_dir: Optional[str] = None) -> OperatorCache:
+    """
+    Adjust the process-wide operator cache.
+
+    Args:
+        max_bytes: New memory budget in bytes (None keeps the current one)
+        cache_dir: Directory for persisted ``.npy`` operators (None keeps the current one)
+
+    Returns:
+        The reconfigured cache
+    """
+    with _operator_cache._lock:
+        if max_bytes is not None:
+            _operator_cache.max_bytes = max_bytes
+            _operator_cache._evict()
+        if cache_dir is not None:
+            _operator_cache.cache_dir = cache_dir
+    return _operator_cache
+
+
+def circulant_column_of(H: np.ndarray, atol: float = 1e-12) -> Optional[np.ndarray]:
+    """Return the first column of ``H`` if the dense matrix is circulant, else None."""
+    dimension = H.shape[0]
+    column = H[:, 0]
+    index = np.arange(dimension)
+    if np.allclose(H, column[np.subtract.outer(index, index) % dimension], rtol=0.0, atol=atol):
+        return column
+    return None
+
+
+class EvolutionEngine:
+    """
+    Applies U = exp(-i H t) to encoded states.
+
+    Circulant Hamiltonians (such as the ring coupling) are diagonalized by the DFT, so the
+    evolution is computed as FFT -> elementwise phase -> inverse FFT in O(d log d) time and
+    O(d) memory without materializing U. Other Hamiltonians fall back to the dense operator
+    from the shared operator cache.
+
+    Either way the spectral decomposition is computed once, so ``evolve`` can move states to
+    any number of evolution times without a fresh matrix exponential per time point. A dense
+    operator or eigenbasis too large for the operator cache's byte budget is kept on the
+    engine instead of being recomputed on every call.
+    """
+
+    def __init__(self, hamiltonian: HamiltonianFamily, dimension: int, time: float = 1.0,
+                 operator_cache: Optional[OperatorCache] = None):
+        self.hamiltonian = hamiltonian
+        self.dimension = dimension
+        self.time = time
+        self.operator_cache = operator_cache if operator_cache is not None else get_operator_cache()
+
+        # Dense results the operator cache cannot hold, kept here instead
+        self._operator: Optional[np.ndarray] = None
+        self._spectrum: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+        self._pending_hamiltonian = None
+        column = hamiltonian.circulant_column(dimension)
+        if column is None:
+            # Probe the dense matrix; it is kept for the first operator build if not circulant
+            H = hamiltonian.build(dimension)
+            column = circulant_column_of(H)
+            if column is None:
+                self._pending_hamiltonian = H
+        self.is_circulant = column is not None
+        self.eigenvalues = None
+        self.phases = None
+        if self.is_circulant:
+            # Eigenvalues of a Hermitian circulant are the (real) DFT of its first column
+            self.eigenvalues = np.fft.fft(column).real
+            self.phases = np.exp(-1j * time * self.eigenvalues)
+
+    def _dense_hamiltonian(self) -> np.ndarray:
+        H = self._pending_hamiltonian
+        return H if H is not None else self.hamiltonian.build(self.dimension)
+
+    def _keep_oversize(self, name: str, array: np.ndarray) -> bool:
+        """Whether ``array`` is too large for the operator cache and must be kept here."""
+        if self.operator_cache.fits(array):
+            return False
+        logger.warning(
+            "%s for %r at dimension %d is %.1f MiB, over the operator cache budget of %.1f MiB;"
+            " keeping it on the evolution engine", name, self.hamiltonian, self.dimension,
+            array.nbytes / 2 ** 20, self.operator_cache.max_bytes / 2 ** 20
+        )
+        return True
+
+    def operator(self) -> np.ndarray:
+        """Return the dense evolution operator (only needed on the non-circulant path)."""
+        if self._operator is not None:
+            return self._operator
+        with self._lock:
+            if self._operator is not None:
+                return self._operator
+            U = self.operator_cache.get_operator(
+                self.dimension, self.time, self.hamiltonian.key, self._dense_hamiltonian
+            )
+            if self._keep_oversize("Evolution operator", U):
+                self._operator = U
+        self._pending_hamiltonian = None
+        return U
+
+    def spectrum(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Return (eigenvalues, eigenvectors) of the Hamiltonian.
+
+        The eigenvectors are None on the circulant path, where the eigenbasis is the DFT.
+        """
+        if self.is_circulant:
+            return self.eigenvalues, None
+        if self._spectrum is not None:
+            return self._spectrum
+        with self._lock:
+            if self._spectrum is not None:
+                return self._spectrum
+            eigenvalues, eigenvectors = self.operator_cache.get_spectrum(
+                self.dimension, self.hamiltonian.key, self._dense_hamiltonian
+            )
+            if self._keep_oversize("Eigenbasis", eigenvectors):
+                self._spectrum = eigenvalues, eigenvectors
+        self._pending_hamiltonian = None
+        return eigenvalues, eigenvectors
+
+    def apply(self, states: np.ndarray) -> np.ndarray:
+        """
+        Evolve a state vector, or a (n_states x dimension) batch of row states.
+
+        Args:
+            states: Array whose last axis has length ``dimension``
+
+        Returns:
+            The evolved states with the same shape
+        """
+        if self.is_circulant:
+            return np.fft.ifft(self.phases * np.fft.fft(states, axis=-1), axis=-1)
+        return states @ self.operator().T
+
+    def evolve(self, states: np.ndarray, times: Union[float, np.ndarray]) -> np.ndarray:
+        """
+        Evolve states to every time in ``times`` in one call.
+
+        Args:
+            states: A state vector or a (n_states x dimension) batch of row states
+            times: Scalar or 1-D array of evolution times
+
+        Returns:
+            Array of shape ``states.shape[:-1] + (len(times), dimension)``
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=float))
+        eigenvalues, eigenvectors = self.spectrum()
+        phases = np.exp(-1j * np.multiply.outer(times, eigenvalues))
+        if eigenvectors is None:
+            spectral = np.fft.fft(states, axis=-1)[..., np.newaxis, :]
+            return np.fft.ifft(spectral * phases, axis=-1)
+        spectral = (states @ eigenvectors.conj())[..., np.newaxis, :]
+        return (spectral * phases) @ eigenvectors.T
+
+    def time_resolved_fidelity(self, reference: np.ndarray, states: np.ndarray,
+                               times: Union[float, np.ndarray]) -> np.ndarray:
+        """
+        Fidelity |<reference|psi(t)>|^2 of each evolved state against a fixed reference.
+
+        Returns:
+            Array of shape ``states.shape[:-1] + (len(times),)``
+        """
+        trajectory = self.evolve(states, times)
+        return np.abs(np.einsum("...d,...td->...t", np.conj(reference), trajectory)) ** 2
+
+
+_evolution_engines: Dict[Tuple, EvolutionEngine] = {}
+_evolution_engines_lock = threading.Lock()
+
+
+def get_evolution_engine(hamiltonian: HamiltonianFamily, dimension: int,
+                         time: float = 1.0) -> EvolutionEngine:
+    """Return the process-wide evolution engine for a Hamiltonian, dimension and time."""
+    key = (hamiltonian.key, int(dimension), float(time))
+    with _evolution_engines_lock:
+        engine = _evolution_engines.get(key)
+        if engine is None:
+            engine = _evolution_engines[key] = EvolutionEngine(hamiltonian, dimension, time)
+        return engine
+
+
+@dataclass
+class BlockFidelity:
+    """Fidelities between two blocks of step states, row by row."""
+    per_step: np.ndarray
+    mean: float
+    min: float
+    trace_distance: float  # mean pure-state trace distance sqrt(1 - F) over the steps
+
+
+def block_fidelities(previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+    """
+    Fidelity |<previous_i|current_i>|^2 / (|previous_i|^2 |current_i|^2) of every row pair.
+
+    Args:
+        previous: (n_steps x dimension) block of row states
+        current: Block of the same shape
+
+    Returns:
+        Array of n_steps fidelities in [0, 1] (0 where either state is all zeros)
+    """
+    previous = np.asarray(previous)
+    current = np.asarray(current)
+    if previous.shape != current.shape:
+        raise ValueError(f"State blocks differ in shape: {previous.shape} vs {current.shape}")
+    overlaps = np.abs(np.einsum("sd,sd->s", previous.conj(), current)) ** 2
+    norms = (np.einsum("sd,sd->s", previous.conj(), previous).real *
+             np.einsum("sd,sd->s", current.conj(), current).real)
+    return np.divide(overlaps, norms, out=np.zeros_like(overlaps), where=norms > 0)
+
+
+def block_fidelity(previous: np.ndarray, current: np.ndarray) -> BlockFidelity:
+    """
+    Per-step and aggregate fidelity between two stacked blocks of step states.
+
+    Each row of ``previous`` is compared with the same row of ``current``, so a solution's
+    steps in one iteration can be compared with the same steps in the next. Empty blocks
+    have nothing to compare, so their aggregates are NaN.
+    """
+    per_step = block_fidelities(previous, current)
+    if per_step.size == 0:
+        return BlockFidelity(per_step, float("nan"), float("nan"), float("nan"))
+    return BlockFidelity(
+        per_step=per_step,
+        mean=float(per_step.mean()),
+        min=float(per_step.min()),
+        trace_distance=float(np.sqrt(np.clip(1.0 - per_step, 0.0, 1.0)).mean())
+    )
+
+
+class StateRingBuffer:
+    """
+    Fixed-capacity history of state vectors in one preallocated (capacity x dimension) array.
+
+    Appending beyond the capacity overwrites the oldest states, so a long-running solve
+    keeps a bounded amount of memory and never reallocates.
+    """
+
+    def __init__(self, capacity: int, dimension: int, dtype: np.dtype = complex):
+        self.capacity = capacity
+        self.dimension = dimension
+        self._states = np.zeros((capacity, dimension), dtype=dtype)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, state: np.ndarray) -> None:
+        self.extend(np.asarray(state)[np.newaxis])
+
+    def extend(self, states: np.ndarray) -> None:
+        """Append the rows of an (n x dimension) block, oldest first."""
+        states = np.asarray(states)
+        if self.capacity == 0 or len(states) == 0:
+            return
+        states = states[-self.capacity:]
+        n = len(states)
+        positions = (self._start + self._size + np.arange(n)) % self.capacity
+        self._states[positions] = states
+        overflow = max(self._size + n - self.capacity, 0)
+        self._start = (self._start + overflow) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def last(self, n: int, skip: int = 0) -> np.ndarray:
+        """
+        The ``n`` states preceding the newest ``skip`` ones, oldest first.
+
+        ``last(n)`` is the newest block of n states and ``last(n, skip=n)`` the block before it.
+        """
+        if n + skip > self._size:
+            raise IndexError(f"Requested {n + skip} states but only {self._size} are stored")
+        first = self._start + self._size - skip - n
+        return self._states[(first + np.arange(n)) % self.capacity]
+
+    def to_array(self) -> np.ndarray:
+        """All stored states, oldest first."""
+        return self.last(self._size)
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
@@ -0,0 +1,374 @@
+"""
+Asyncio service front-end for GeneralQuantumSolver.
+
+Solve requests arrive over a small HTTP endpoint or as JSON lines on stdin. Every request
+runs in its own SolveSession; the generations those sessions need are coalesced by a
+GenerationBatcher into dynamic batches (bounded by a batch size and a max-wait deadline),
+and the sessions' typed progress events are streamed back to the client as JSON lines.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from general import GeneralQuantumSolver, GenerationResult, ResultEvent, event_to_dict
+from perf import PerfRecorder, recording
+from tracing import configure_logging, configure_tracing, get_logger
+
+logger = get_logger("serving")
+
+
+@dataclass
+class _PendingGeneration:
+    prompt: str
+    temperature: float
+    max_new_tokens: int
+    system_prompt: str
+    future: asyncio.Future
+    enqueued_at: float
+    recorder: Optional[PerfRecorder] = None
+
+    @property
+    def batch_key(self):
+        return (self.temperature, self.max_new_tokens, self.system_prompt)
+
+
+def validate_request(request: object) -> Optional[str]:
+    """Return why a decoded solve request is invalid, or None if it can be served."""
+    if not isinstance(request, dict) or not isinstance(request.get("problem"), str):
+        return "body must be a JSON object with a 'problem' string"
+    max_tokens = request.get("max_tokens", 2000)
+    if isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or max_tokens <= 0:
+        return "'max_tokens' must be a positive integer"
+    domain = request.get("domain")
+    if domain is not None and not isinstance(domain, str):
+        return "'domain' must be a string"
+    return None
+
+
+class GenerationBatcher:
+    """
+    Coalesces generation requests from all in-flight sessions into dynamic batches.
+
+    A batch is dispatched as soon as ``max_batch_size`` compatible requests (same
+    temperature, token budget and system prompt) are waiting, or when the oldest waiting
+    request has been queued for ``max_wait`` seconds, whichever comes first. Batches run on
+    a single worker thread so the event loop stays responsive while the model generates.
+
+    Each batch is timed with its own PerfRecorder. Its stages (tokenize, generate, decode,
+    ...) are added once to the recorder of every session in the batch, so a session's
+    report shows the wall time of the batches it waited on, shared with the other sessions
+    in them; token counters are the session's own.
+    """
+
+    def __init__(self, solver: GeneralQuantumSolver, max_batch_size: int = 8,
+                 max_wait: float = 0.05):
+        self.solver = solver
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: List[_PendingGeneration] = []
+        self._wakeup = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=False)
+
+    async def generate(self, prompt: str, temperature: float, max_new_tokens: int,
+                       system_prompt: str,
+                       recorder: Optional[PerfRecorder] = None) -> GenerationResult:
+        """
+        Queue one prompt and wait for its completion from a shared batch.
+
+        Args:
+            recorder: Session recorder that receives the batch's stage timings and this
+                prompt's token counts
+        """
+        loop = asyncio.get_running_loop()
+        request = _PendingGeneration(prompt, temperature, max_new_tokens, system_prompt,
+                                     loop.create_future(), loop.time(), recorder)
+        self._queue.append(request)
+        self._wakeup.set()
+        return await request.future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            if not self._queue:
+                self._wakeup.clear()
+                continue
+
+            # Wait for more requests until the batch is full or the oldest request's deadline
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests left behind with a different batch key must not wait for a new arrival
+            batch = self._take_batch()
+            if self._queue:
+                self._wakeup.set()
+            else:
+                self._wakeup.clear()
+            temperature, max_new_tokens, system_prompt = batch[0].batch_key
+            batch_perf = PerfRecorder()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._generate_recorded, batch_perf,
+                    [request.prompt for request in batch], temperature, max_new_tokens,
+                    system_prompt
+                )
+            except Exception as error:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(error)
+                continue
+            self._record(batch, results, batch_perf.report()['stages'])
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result(result)
+
+    def _generate_recorded(self, batch_perf: PerfRecorder, *args) -> List[GenerationResult]:
+        with recording(batch_perf):
+            return self.solver._generate_batch(*args)
+
+    @staticmethod
+    def _record(batch: List[_PendingGeneration], results: List[GenerationResult],
+                stages: Dict[str, Dict]) -> None:
+        """Add a finished batch's stage timings and token counts to its sessions' recorders."""
+        recorders = {
+            id(request.recorder): request.recorder for request in batch if request.recorder
+        }
+        for recorder in recorders.values():
+            recorder.add_stages(stages)
+        for request, result in zip(batch, results):
+            if request.recorder is not None:
+                request.recorder.count('prompt_tokens', result.prompt_tokens)
+                request.recorder.count('completion_tokens', result.completion_tokens)
+
+    def _take_batch(self) -> List[_PendingGeneration]:
+        """Remove and return up to max_batch_size requests compatible with the oldest one."""
+        key = self._queue[0].batch_key
+        batch, remaining = [], []
+        for request in self._queue:
+            if len(batch) < self.max_batch_size and request.batch_key == key:
+                batch.append(request)
+            else:
+                remaining.append(request)
+        self._queue = remaining
+        return batch
+
+
+class QuantumSolverService:
+    """Serves concurrent solve requests against one shared GeneralQuantumSolver."""
+
+    def __init__(self, solver: GeneralQuantumSolver, max_batch_size: int = 8,
+                 max_wait: float = 0.05):
+        self.solver = solver
+        self.batcher = GenerationBatcher(solver, max_batch_size, max_wait)
+
+    async def start(self) -> None:
+        self.batcher.start()
+
+    async def stop(self) -> None:
+        await self.batcher.stop()
+
+    async def solve(self, problem: str, domain: Optional[str] = None,
+                    max_tokens: int = 2000) -> AsyncIterator[Dict]:
+        """
+        Solve one problem, yielding progress events as JSON-serializable dicts.
+
+        Yields the session's events (see general.event_to_dict) as each batch of
+        generations is consumed, ending with a 'result' event carrying the solve()-style
+        analysis.
+        """
+        loop = asyncio.get_running_loop()
+        session = self.solver.create_session(problem, domain, max_tokens)
+        while not session.done:
+            results = await asyncio.gather(*(
+                self.batcher.generate(prompt, session.temperature, max_tokens,
+                                      session.system_prompt, recorder=session.perf)
+                for prompt in session.pending
+            ))
+            await loop.run_in_executor(None, session.advance, list(results))
+            for event in session.drain_events():
+                yield event_to_dict(event)
+        yield event_to_dict(ResultEvent(session.analysis()))
+
+    async def handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Minimal HTTP/1.1 handler.
+
+        ``POST /solve`` with a JSON body ``{"problem": ..., "domain": ..., "max_tokens": ...}``
+        streams newline-delimited JSON events; ``GET /health`` reports liveness.
+        """
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                content_length = int(headers.get("content-length", 0))
+            except ValueError:
+                content_length = -1
+            if content_length < 0:
+                await self._write_response(writer, 400, {'error': 'invalid Content-Length'})
+                return
+            body = await reader.readexactly(content_length)
+
+            if len(request_line) < 2:
+                await self._write_response(writer, 400, {'error': 'malformed request'})
+            elif request_line[:2] == ["GET", "/health"]:
+                await self._write_response(writer, 200, {'status': 'ok'})
+            elif request_line[:2] == ["POST", "/solve"]:
+                try:
+                    request = json.loads(body or b"{}")
+                except ValueError:
+                    request = None
+                error = validate_request(request)
+                if error is not None:
+                    await self._write_response(writer, 400, {'error': error})
+                    return
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                             b"Connection: close\r\n\r\n")
+                async for event in self._solve_events(request):
+                    writer.write(json.dumps(event).encode("utf-8") + b"\n")
+                    await writer.drain()
+            else:
+                await self._write_response(writer, 404, {'error': 'not found'})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _solve_events(self, request: Dict) -> AsyncIterator[Dict]:
+        """
+        Events of solve() for a validated request.
+
+        The response status is already sent when events stream, so a failure mid-solve
+        ends the stream with an 'error' event instead of cutting it off.
+        """
+        try:
+            async for event in self.solve(request["problem"], request.get("domain"),
+                                          request.get("max_tokens", 2000)):
+                yield event
+        except Exception as error:
+            logger.exception("Solve failed")
+            yield {'event': 'error', 'error': f"{type(error).__name__}: {error}"}
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, status: int, payload: Dict) -> None:
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found"}
+        body = json.dumps(payload).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {reasons[status]}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve_http(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        await self.start()
+        server = await asyncio.start_server(self.handle_http, host, port)
+        logger.info("Serving on http://%s:%d", host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def serve_stdio(self) -> None:
+        """
+        Serve JSON-line requests from stdin, writing JSON-line events to stdout.
+
+        Each request is ``{"id": ..., "problem": ..., "domain": ..., "max_tokens": ...}``;
+        every event written back carries the request's ``id``. Requests are handled
+        concurrently, so their generations share batches.
+        """
+        await self.start()
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        out = sys.stdout
+
+        async def handle(request: Dict) -> None:
+            async for event in self._solve_events(request):
+                out.write(json.dumps({'id': request.get("id"), **event}) + "\n")
+                out.flush()
+
+        tasks = set()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = None
+            error = validate_request(request)
+            if error is not None:
+                request_id = request.get("id") if isinstance(request, dict) else None
+                out.write(json.dumps({'id': request_id, 'event': 'error', 'error': error}) + "\n")
+                out.flush()
+                continue
+            task = loop.create_task(handle(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        await self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve GeneralQuantumSolver over HTTP or stdio")
+    parser.add_argument("--model-path", default="unsloth/Meta-Llama-3.1-8B-Instruct")
+    parser.add_argument("--dimension", type=int, default=512)
+    parser.add_argument("--domain", default=None)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait", type=float, default=0.05,
+                        help="Seconds the oldest request may wait for a batch to fill")
+    parser.add_argument("--stdio", action="store_true", help="Read JSON-line requests from stdin")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default=None,
+                        help="Logging level (default QUANTUM_LOG_LEVEL or INFO)")
+    parser.add_argument("--trace-file", default=None, help="Append JSONL trace events to this file")
+    args = parser.parse_args()
+
+    configure_logging(args.log_level)
+    if args.trace_file:
+        configure_tracing(args.trace_file)
+    # Load the model up front so the first request does not pay for it
+    solver = GeneralQuantumSolver(model_path=args.model_path, dimension=args.dimension,
+                                  domain=args.domain).load()
+    service = QuantumSolverService(solver, args.max_batch_size, args.max_wait)
+    if args.stdio:
+        asyncio.run(service.serve_stdio())
+    else:
+        asyncio.run(service.serve_http(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Tests for the tokenizer-only analysis utilities."""
+import random
+
+import numpy as np
+
+from analysis import (QuantumStateAnalyzer, StabilityTracker, StepConvergenceTracker,
+                      step_complexity)
+from benchmarks.fakes import FakeTokenizer
+
+
+def _solutions(seed: int, count: int):
+    """Solutions that alternately repeat and change, so both stable and unstable windows occur."""
+    rng = random.Random(seed)
+    solutions, current = [], "x = 1"
+    for _ in range(count):
+        if rng.random() < 0.4:
+            current = f"x = {rng.randint(0, 5)} and y^{rng.randint(1, 3)} + {rng.randint(0, 9)}"
+        solutions.append(current)
+    return solutions
+
+
+def test_stability_tracker_matches_list_history():
+    analyzer = QuantumStateAnalyzer(vocab_size=1000)
+    for window in (1, 2, 3, 5):
+        analyzer.stability_window = window
+        for seed in range(5):
+            tracker, history = analyzer.stability_tracker(), []
+            for solution in _solutions(seed, 40):
+                expected = analyzer.check_solution_stability(solution, history)
+                assert analyzer.check_solution_stability(solution, tracker) == expected
+                assert list(tracker.solutions) == history
+
+
+def test_check_solution_stability_without_history_keeps_analyzer_history():
+    analyzer = QuantumStateAnalyzer(vocab_size=1000)
+    checks = [analyzer.check_solution_stability("x = 2") for _ in range(5)]
+    assert checks == [False] * 3 + [True] * 2
+
+
+def test_stability_tracker_clear():
+    tracker = StabilityTracker(window=2)
+    for _ in range(4):
+        tracker.update("x = 2")
+    assert tracker.ready
+    tracker.clear()
+    assert not tracker.ready
+    assert not tracker.update("x = 2")
+
+
+def test_step_convergence_tracker_freezes_steady_steps():
+    tracker = StepConvergenceTracker(3, window=2, threshold=0.01, convergence_threshold=0.9)
+    assert [tracker.update(0, 0.95), tracker.update(0, 0.955)] == [False, True]
+    assert [tracker.update(1, 0.5), tracker.update(1, 0.5)] == [False, False]  # mean too low
+    assert [tracker.update(2, 0.91), tracker.update(2, 0.99)] == [False, False]  # spread too wide
+    assert tracker.unconverged() == [1, 2]
+    assert tracker.converged_step_numbers() == [1]
+    assert tracker.update(2, 0.995) and not tracker.all_converged
+    assert not StepConvergenceTracker(0).all_converged
+
+
+def test_state_cache_hit_returns_writable_copy():
+    analyzer = QuantumStateAnalyzer(FakeTokenizer(), dimension=64)
+    first = analyzer.apply_quantum_operation("x + y = 2")
+    first[:] = 0
+    second = analyzer.apply_quantum_operation("x + y = 2")
+    assert analyzer.state_cache_stats()['hits'] == 1
+    assert second.flags.writeable
+    assert np.any(second != 0)
+
+
+def test_state_cache_key_includes_dimension_and_vocab_size():
+    tokenizer = FakeTokenizer()
+    analyzers = [QuantumStateAnalyzer(tokenizer, dimension=64),
+                 QuantumStateAnalyzer(tokenizer, dimension=32),
+                 QuantumStateAnalyzer(tokenizer, vocab_size=1000, dimension=64)]
+    for analyzer in analyzers[1:]:
+        analyzer.state_cache = analyzers[0].state_cache
+    for analyzer in analyzers:
+        analyzer.apply_quantum_operation("x + y = 2")
+    stats = analyzers[0].state_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (0, 3, 3)
+    analyzers[2].apply_quantum_operation("x + y = 2")
+    assert analyzers[0].state_cache_stats()['hits'] == 1
+
+
+def test_state_cache_evicts_least_recently_used():
+    analyzer = QuantumStateAnalyzer(FakeTokenizer(), dimension=64, state_cache_entries=2)
+    for text in ("x = 1", "x = 2", "x = 1", "x = 3"):
+        analyzer.apply_quantum_operation(text)
+    assert analyzer.state_cache_stats()['entries'] == 2
+    analyzer.apply_quantum_operation("x = 1")
+    assert analyzer.state_cache_stats()['hits'] == 2
+    analyzer.apply_quantum_operation("x = 2")
+    assert analyzer.state_cache_stats()['hits'] == 2
+
+
+def test_token_id_states_match_text_states():
+    tokenizer = FakeTokenizer()
+    texts = ["x + y = 2", "Let n = 2m, so the sum is m(n + 1)α", ""]
+    text_states = QuantumStateAnalyzer(tokenizer, dimension=64).apply_quantum_operation_batch(texts)
+
+    analyzer = QuantumStateAnalyzer(vocab_size=tokenizer.vocab_size, dimension=64)
+    token_ids = [tokenizer.encode(text) for text in texts]
+    np.testing.assert_allclose(analyzer.apply_quantum_operation_token_ids(token_ids), text_states)
+    analyzer.apply_quantum_operation_token_ids(token_ids[:1])
+    assert analyzer.state_cache_stats()['hits'] == 1
+
+
+def test_analyze_transcripts():
+    analyzer = QuantumStateAnalyzer(FakeTokenizer(), dimension=64)
+    transcripts = ["Step 1: x = 1\nStep 2: y = 2\nStep 3: x + y = 3", "No steps here",
+                   "Step 1: ∴ α = 2k"]
+    analyses = analyzer.analyze_transcripts(transcripts)
+
+    steps = ["x = 1", "y = 2", "x + y = 3"]
+    states = [analyzer.apply_quantum_operation(step) for step in steps]
+    assert analyses[0]['num_steps'] == 3
+    assert analyses[0]['complexity_scores'] == [step_complexity(step) for step in steps]
+    np.testing.assert_allclose(analyses[0]['step_convergence'],
+                               [np.abs(np.vdot(a, b)) ** 2 for a, b in zip(states, states[1:])])
+    assert analyses[1] == {'num_steps': 0, 'complexity_scores': [], 'mean_complexity': 0.0,
+                           'step_convergence': []}
+    assert analyses[2]['step_convergence'] == []
+    assert analyses == [analyzer.analyze_transcript(text) for text in transcripts]
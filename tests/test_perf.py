@@ -0,0 +1,30 @@
+"""Tests for the perf recorder and profiler helpers."""
+import os
+import threading
+
+from perf import profiled
+
+
+def test_profiled_skips_nested_and_concurrent_profiles(tmp_path):
+    outer_path = tmp_path / "outer.prof"
+    inner_path = tmp_path / "inner.prof"
+    thread_results = []
+
+    def profile_in_thread():
+        with profiled(str(inner_path)) as profiler:
+            thread_results.append(profiler)
+
+    with profiled(str(outer_path)) as outer:
+        with profiled(str(inner_path)) as inner:
+            assert inner is None
+        thread = threading.Thread(target=profile_in_thread)
+        thread.start()
+        thread.join()
+    assert outer is not None
+    assert thread_results == [None]
+    assert os.path.exists(outer_path)
+    assert not os.path.exists(inner_path)
+
+    with profiled(str(inner_path)) as again:
+        assert again is not None
+    assert os.path.exists(inner_path)
@@ -0,0 +1,166 @@
+"""Tests for the Hamiltonians, evolution engine and state buffers."""
+import numpy as np
+import pytest
+from scipy.linalg import expm
+
+from quantum_ops import (EvolutionEngine, HamiltonianFamily, OperatorCache, RingCouplingHamiltonian,
+                         StateRingBuffer, block_fidelities, block_fidelity, encode_token_batch)
+
+
+def baseline_hamiltonian(dimension: int) -> np.ndarray:
+    """The Hamiltonian as originally built element by element in the solver."""
+    H = np.zeros((dimension, dimension), dtype=complex)
+    for i in range(dimension):
+        for j in range(dimension):
+            if i != j:
+                distance = min(abs(i - j), dimension - abs(i - j))
+                H[i, j] = 1.0 / (1.0 + distance) * np.exp(1j * np.pi * distance / dimension)
+    return (H + H.conj().T) / 2
+
+
+class PerturbedRingHamiltonian(HamiltonianFamily):
+    """The baseline Hamiltonian plus a site-dependent potential, so it is not circulant."""
+
+    name = "test_perturbed_ring"
+
+    def build(self, dimension: int) -> np.ndarray:
+        return baseline_hamiltonian(dimension) + np.diag(np.linspace(0.0, 1.0, dimension))
+
+
+def _states(dimension: int, count: int = 3) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    states = rng.normal(size=(count, dimension)) + 1j * rng.normal(size=(count, dimension))
+    return states / np.linalg.norm(states, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("dimension", [8, 33, 64])
+def test_ring_coupling_matches_baseline_hamiltonian(dimension):
+    np.testing.assert_allclose(RingCouplingHamiltonian().build(dimension),
+                               baseline_hamiltonian(dimension), atol=1e-12)
+
+
+@pytest.mark.parametrize("dimension", [8, 33, 64])
+def test_fft_evolution_matches_expm(dimension):
+    engine = EvolutionEngine(RingCouplingHamiltonian(), dimension, time=0.7,
+                             operator_cache=OperatorCache())
+    assert engine.is_circulant
+    states = _states(dimension)
+    U = expm(-1j * 0.7 * baseline_hamiltonian(dimension))
+
+    np.testing.assert_allclose(engine.apply(states), states @ U.T, atol=1e-10)
+    np.testing.assert_allclose(engine.apply(states[0]), U @ states[0], atol=1e-10)
+
+
+def test_eigh_evolution_matches_expm():
+    dimension, times = 32, np.array([0.0, 0.5, 1.0])
+    H = PerturbedRingHamiltonian().build(dimension)
+    engine = EvolutionEngine(PerturbedRingHamiltonian(), dimension, time=1.0,
+                             operator_cache=OperatorCache())
+    assert not engine.is_circulant
+    states = _states(dimension)
+
+    np.testing.assert_allclose(engine.apply(states), states @ expm(-1j * H).T, atol=1e-10)
+    trajectory = engine.evolve(states, times)
+    for t_index, t in enumerate(times):
+        np.testing.assert_allclose(trajectory[:, t_index], states @ expm(-1j * t * H).T, atol=1e-10)
+
+
+def baseline_features(tokens, dimension: int, vocab_size: int, fold: bool) -> np.ndarray:
+    """Token features as originally built token by token, optionally folding long inputs."""
+    features = np.zeros(dimension, dtype=complex)
+    for i, token in enumerate(tokens if fold else tokens[:dimension]):
+        position = i % dimension
+        features[position] += token / vocab_size * np.exp(2j * np.pi * (position / dimension))
+    norm = np.linalg.norm(features)
+    return features / norm if norm > 0 else features
+
+
+@pytest.mark.parametrize("fold", [False, True])
+def test_batched_encoding_matches_per_text_encoding(fold):
+    dimension, vocab_size = 8, 100
+    rng = np.random.default_rng(0)
+    token_ids = [rng.integers(1, vocab_size, size=n).tolist() for n in (5, 8, 0, 19, 3)]
+
+    batch = encode_token_batch(token_ids, dimension, vocab_size, fold=fold)
+    for row, ids in zip(batch, token_ids):
+        np.testing.assert_allclose(row, encode_token_batch([ids], dimension, vocab_size, fold)[0])
+        np.testing.assert_allclose(row, baseline_features(ids, dimension, vocab_size, fold),
+                                   atol=1e-12)
+
+
+def test_state_ring_buffer_wraps_around():
+    buffer = StateRingBuffer(capacity=4, dimension=2, dtype=float)
+    rows = np.arange(20, dtype=float).reshape(10, 2)
+
+    buffer.extend(rows[:3])
+    np.testing.assert_array_equal(buffer.to_array(), rows[:3])
+    buffer.append(rows[3])
+    buffer.append(rows[4])
+    assert len(buffer) == 4
+    np.testing.assert_array_equal(buffer.to_array(), rows[1:5])
+    np.testing.assert_array_equal(buffer.last(2), rows[3:5])
+    np.testing.assert_array_equal(buffer.last(2, skip=2), rows[1:3])
+
+    buffer.extend(rows[5:10])  # longer than the capacity: only the newest rows are kept
+    np.testing.assert_array_equal(buffer.to_array(), rows[6:10])
+    with pytest.raises(IndexError):
+        buffer.last(3, skip=2)
+
+    buffer.clear()
+    assert len(buffer) == 0
+    buffer.append(rows[0])
+    np.testing.assert_array_equal(buffer.to_array(), rows[:1])
+
+
+def test_block_fidelity_matches_hand_computed_values():
+    previous = np.array([[1, 0], [1, 0], [0, 0]], dtype=complex)
+    current = np.array([[2j, 0], [1j, 1j], [1, 0]], dtype=complex)
+    # Global phase and scale do not matter; a zero state has fidelity 0
+    np.testing.assert_allclose(block_fidelities(previous, current), [1.0, 0.5, 0.0])
+
+    block = block_fidelity(previous, current)
+    assert block.mean == pytest.approx(0.5)
+    assert block.min == 0.0
+    assert block.trace_distance == pytest.approx((0.0 + np.sqrt(0.5) + 1.0) / 3)
+
+    with pytest.raises(ValueError):
+        block_fidelities(previous, current[:2])
+    empty = block_fidelity(np.zeros((0, 2)), np.zeros((0, 2)))
+    assert np.isnan(empty.mean) and np.isnan(empty.min) and np.isnan(empty.trace_distance)
+
+
+class CountingHamiltonian(PerturbedRingHamiltonian):
+    name = "test_counting_ring"
+
+    def __init__(self):
+        super().__init__()
+        self.builds = 0
+
+    def build(self, dimension: int) -> np.ndarray:
+        self.builds += 1
+        return super().build(dimension)
+
+
+def test_oversize_operators_are_kept_on_the_engine(caplog):
+    """Results over the operator cache budget are computed once, not on every call."""
+    dimension = 16
+    hamiltonian = CountingHamiltonian()
+    cache = OperatorCache(max_bytes=dimension * 8)  # room for eigenvalues only
+    engine = EvolutionEngine(hamiltonian, dimension, time=1.0, operator_cache=cache)
+    states = _states(dimension)
+
+    with caplog.at_level("WARNING", logger="quantum_reflection.quantum_ops"):
+        first = engine.apply(states)
+        for _ in range(3):
+            np.testing.assert_array_equal(engine.apply(states), first)
+            engine.evolve(states, [0.5, 1.0])
+    builds = hamiltonian.builds
+    engine.apply(states)
+    engine.evolve(states, 1.0)
+
+    assert hamiltonian.builds == builds
+    assert len(cache) == 1
+    warnings = [record for record in caplog.records if "operator cache budget" in record.message]
+    assert len(warnings) == 2
+    U = expm(-1j * hamiltonian.build(dimension))
+    np.testing.assert_allclose(first, states @ U.T, atol=1e-10)
@@ -0,0 +1,138 @@
+"""Tests for the asyncio serving front-end."""
+import asyncio
+import json
+from typing import List
+
+from benchmarks.fakes import make_fake_solver
+from general import GenerationResult
+from serving import GenerationBatcher, QuantumSolverService, validate_request
+
+
+class _RecordingSolver:
+    """Stands in for the solver's _generate_batch and records every batch it receives."""
+
+    def __init__(self):
+        self.batches = []
+
+    def _generate_batch(self, prompts: List[str], temperature: float, max_new_tokens: int,
+                        system_prompt: str) -> List[GenerationResult]:
+        self.batches.append((list(prompts), temperature))
+        return [GenerationResult(f"{prompt}@{temperature}", 1, 1) for prompt in prompts]
+
+
+def test_batcher_dispatches_requests_with_different_batch_keys():
+    """Requests left in the queue after a batch is taken are dispatched without new arrivals."""
+    solver = _RecordingSolver()
+
+    async def scenario():
+        batcher = GenerationBatcher(solver, max_batch_size=8, max_wait=0.01)
+        batcher.start()
+        try:
+            return await asyncio.wait_for(asyncio.gather(
+                batcher.generate("a", 0.1, 16, "system"),
+                batcher.generate("b", 0.7, 16, "system"),
+                batcher.generate("c", 0.1, 16, "system"),
+            ), timeout=5)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(scenario())
+    assert [result.text for result in results] == ["a@0.1", "b@0.7", "c@0.1"]
+    assert solver.batches == [(["a", "c"], 0.1), (["b"], 0.7)]
+
+
+def test_service_solves_concurrent_problems_in_different_domains():
+    """Sessions with different system prompts share the batcher without stalling."""
+    service = QuantumSolverService(make_fake_solver(dimension=64), max_batch_size=4, max_wait=0.01)
+
+    async def collect(problem, domain):
+        return [event async for event in service.solve(problem, domain, max_tokens=64)]
+
+    async def scenario():
+        await service.start()
+        try:
+            return await asyncio.wait_for(asyncio.gather(
+                collect("Find all real x with x^2 - 5x + 6 = 0.", "algebra"),
+                collect("Find all primes p such that p^2 + 2 is prime.", "number_theory"),
+            ), timeout=30)
+        finally:
+            await service.stop()
+
+    for events in asyncio.run(scenario()):
+        assert events[0]['event'] == 'initial_solution'
+        assert events[-1]['event'] == 'result'
+
+
+def _http_exchange(service: QuantumSolverService, raw_request: bytes) -> bytes:
+    """Send one raw HTTP request to the service's handler and return the raw response."""
+    async def scenario():
+        await service.start()
+        server = await asyncio.start_server(service.handle_http, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw_request)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout=30)
+            writer.close()
+            return response
+        finally:
+            server.close()
+            await server.wait_closed()
+            await service.stop()
+
+    return asyncio.run(scenario())
+
+
+def _post_solve(body: bytes, content_length: object = None) -> bytes:
+    length = len(body) if content_length is None else content_length
+    return (f"POST /solve HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode("latin-1") + body)
+
+
+def test_validate_request():
+    assert validate_request({'problem': "x", 'max_tokens': 32, 'domain': "algebra"}) is None
+    assert validate_request({'problem': "x"}) is None
+    assert validate_request(None) is not None
+    assert validate_request({'domain': "algebra"}) is not None
+    assert validate_request({'problem': "x", 'max_tokens': "many"}) is not None
+    assert validate_request({'problem': "x", 'max_tokens': 0}) is not None
+    assert validate_request({'problem': "x", 'max_tokens': True}) is not None
+
+
+def test_http_rejects_bad_requests_with_400():
+    for raw in (_post_solve(b"{}", content_length="ten"),
+                _post_solve(b'{"problem": "x", "max_tokens": "many"}'),
+                _post_solve(b"not json")):
+        response = _http_exchange(QuantumSolverService(_RecordingSolver()), raw)
+        assert response.startswith(b"HTTP/1.1 400")
+
+
+def test_http_reports_generation_failure_as_error_event():
+    solver = make_fake_solver(dimension=64)
+
+    def fail(*args):
+        raise RuntimeError("model crashed")
+
+    solver._generate_batch = fail
+    service = QuantumSolverService(solver, max_wait=0.01)
+    response = _http_exchange(service, _post_solve(b'{"problem": "Find x.", "max_tokens": 8}'))
+    assert response.startswith(b"HTTP/1.1 200")
+    last_event = json.loads(response.rstrip(b"\n").rsplit(b"\n", 1)[-1])
+    assert last_event['event'] == 'error'
+    assert "model crashed" in last_event['error']
+
+
+def test_served_perf_report_includes_generation_stages():
+    service = QuantumSolverService(make_fake_solver(dimension=64), max_batch_size=4, max_wait=0.01)
+
+    async def scenario():
+        await service.start()
+        try:
+            problem = "Find all real x with x^2 - 5x + 6 = 0."
+            return [event async for event in service.solve(problem, "algebra", max_tokens=64)]
+        finally:
+            await service.stop()
+
+    perf = asyncio.run(scenario())[-1]['result']['perf']
+    assert {'tokenize', 'generate', 'decode'} <= set(perf['stages'])
+    assert perf['counters']['completion_tokens'] > 0
@@ -0,0 +1,244 @@
+"""Tests for GeneralQuantumSolver sessions, step refinement, concurrency and batching."""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+from benchmarks.fakes import CANNED_RESPONSES, FakeCausalLM, FakeTokenizer, make_fake_solver
+from general import (ConvergedEvent, GeneralQuantumSolver, GenerationResult, InitialSolutionEvent,
+                     StepConvergedEvent, StepImprovedEvent)
+
+PROBLEMS = [
+    "Find all real x with x^2 - 5x + 6 = 0.",
+    "Find all primes p such that p^2 + 2 is prime.",
+    "Prove that the sum of the first n odd numbers is n^2.",
+    "Determine all functions f with f(x + y) = f(x) + f(y).",
+]
+
+
+def _warm_solver(domain=None):
+    """
+    A fake solver that has already solved every problem once.
+
+    FakeTokenizer assigns ids to words in first-seen order, so token ids (and with them the
+    quantum states) only stop depending on solve order once every word has been seen.
+    """
+    solver = make_fake_solver(dimension=64)
+    for problem in PROBLEMS:
+        solver.solve(problem, max_tokens=64, domain=domain)
+    return solver
+
+
+def _outcome(result):
+    """The parts of a solve() result that do not depend on timing."""
+    return {key: value for key, value in result.items() if key != 'perf'}
+
+
+def _assert_same_outcome(actual, expected):
+    actual, expected = _outcome(actual), _outcome(expected)
+    np.testing.assert_allclose(actual.pop('convergence'), expected.pop('convergence'))
+    assert actual == expected
+
+
+def test_concurrent_solves_match_serial_solves():
+    """Solves sharing one solver from several threads keep their histories separate."""
+    solver = _warm_solver()
+    serial = [solver.solve(problem, max_tokens=64) for problem in PROBLEMS]
+    with ThreadPoolExecutor(max_workers=len(PROBLEMS)) as pool:
+        concurrent = list(pool.map(lambda problem: solver.solve(problem, max_tokens=64), PROBLEMS))
+
+    for actual, expected in zip(concurrent, serial):
+        _assert_same_outcome(actual, expected)
+
+
+def test_solve_many_matches_solve():
+    solver = _warm_solver(domain="algebra")
+    batched = solver.solve_many(PROBLEMS, domain="algebra", max_tokens=64, batch_size=3)
+
+    assert batched['throughput']['perf']['stages']
+    for problem, actual in zip(PROBLEMS, batched['results']):
+        _assert_same_outcome(actual, solver.solve(problem, max_tokens=64, domain="algebra"))
+
+
+def test_generation_result_holds_only_the_completion():
+    solver = make_fake_solver(dimension=64)
+    tokenizer = solver.tokenizer
+    for prompt in (PROBLEMS[0], solver._problem_prompt(PROBLEMS[0])):
+        result = solver._generate(prompt, 0.7, 2000)
+        assert result.text in CANNED_RESPONSES
+        assert result.prompt_tokens == len(tokenizer.encode(prompt))
+        assert result.completion_tokens == len(tokenizer.encode(result.text,
+                                                                add_special_tokens=False))
+
+    truncated = solver._generate(PROBLEMS[0], 0.7, 5)
+    assert truncated.completion_tokens == 5
+    assert solver._generate(PROBLEMS[0], 0.7, 2000).text.startswith(truncated.text)
+
+
+def test_batched_generation_matches_per_prompt_generation():
+    solver = make_fake_solver(dimension=64)
+    system_prompt = solver.system_prompt
+    for prompts in (PROBLEMS, [solver._problem_prompt(problem) for problem in PROBLEMS]):
+        input_ids, attention_mask, _ = solver._encode_prompts(prompts, system_prompt)
+        # Rows of different lengths are padded on the left, so every row ends on a prompt token
+        assert len(set(attention_mask.sum(dim=-1).tolist())) > 1
+        assert (attention_mask[:, -1] == 1).all()
+        batched = solver._generate_batch(prompts, 0.7, 12, system_prompt)
+        assert batched == [solver._generate(prompt, 0.7, 12, system_prompt) for prompt in prompts]
+
+
+def _session_after_initial(solver, initial="Step 1: x = 1\nStep 2: y = 2"):
+    """A session that has received ``initial`` and is waiting for its first reflections."""
+    session = solver.create_session("Find x and y.", max_tokens=64)
+    session.advance([GenerationResult(initial, 1, 1)])
+    return session
+
+
+def _reflect(session, *completions):
+    session.advance([GenerationResult(text, 1, 1) for text in completions])
+    return [event for event in session.drain_events() if isinstance(event, StepImprovedEvent)]
+
+
+def test_accepted_improvement_feeds_the_next_iteration():
+    session = _session_after_initial(make_fake_solver(dimension=64))
+    assert len(session.pending) == 2
+
+    improved = _reflect(session, "x = 1 since x + y = 2 and x - y = 0", "y = 2")
+    assert [event.accepted for event in improved] == [True, True]
+    assert session.current_steps == ["x = 1 since x + y = 2 and x - y = 0", "y = 2"]
+    assert "x = 1 since x + y = 2 and x - y = 0" in session.pending[0]
+
+
+def test_rejected_improvement_leaves_the_step_unchanged():
+    session = _session_after_initial(make_fake_solver(dimension=64))
+
+    improved = _reflect(session, "   ", "y = 2 because x = 1")
+    assert [event.accepted for event in improved] == [False, True]
+    assert session.current_steps == ["x = 1", "y = 2 because x = 1"]
+    assert "Current Step:\n        x = 1\n" in session.pending[0]
+
+
+def test_no_acceptance_policy_keeps_the_initial_steps():
+    solver = make_fake_solver(dimension=64)
+    solver.acceptance_policy = None
+    session = _session_after_initial(solver)
+
+    improved = _reflect(session, "x = 5", "y = 7")
+    assert [event.accepted for event in improved] == [False, False]
+    assert session.current_steps == ["x = 1", "y = 2"]
+
+    session = solver.create_session(PROBLEMS[0], max_tokens=64)
+    events = list(session.iter_events())
+    initial = next(event for event in events if isinstance(event, InitialSolutionEvent))
+    assert any(isinstance(event, StepImprovedEvent) for event in events)
+    assert session.result()['final_steps'] == initial.steps
+
+
+def test_multi_step_completion_is_trimmed_to_one_step():
+    session = _session_after_initial(make_fake_solver(dimension=64))
+
+    improved = _reflect(session, "x = 1 exactly\nStep 2: y = 2\nStep 3: done",
+                        "Step 2: y = 2 exactly\nStep 3: so x + y = 3")
+    assert [event.text for event in improved] == ["x = 1 exactly", "y = 2 exactly"]
+    assert session.current_steps == ["x = 1 exactly", "y = 2 exactly"]
+    assert _reflect(session, "Step 1:", "Step 3: z = 3")[0].accepted is False
+    assert session.current_steps[0] == "x = 1 exactly"
+
+
+def test_swapping_model_or_tokenizer_drops_prefix_caches():
+    solver = make_fake_solver(dimension=64)
+    solver.solve(PROBLEMS[0], max_tokens=64)
+    assert len(solver._prefix_caches) == 1
+
+    solver.model = FakeCausalLM(solver.tokenizer, seed=1)
+    assert len(solver._prefix_caches) == 0
+
+    solver.solve(PROBLEMS[0], max_tokens=64)
+    solver.tokenizer = FakeTokenizer()
+    assert len(solver._prefix_caches) == 0
+
+
+def _tiny_llama_solver():
+    """A solver backed by a small randomly initialized Llama, so generation runs a real model."""
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    torch.manual_seed(0)
+    config = LlamaConfig(vocab_size=512, hidden_size=32, intermediate_size=64,
+                         num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=4,
+                         initializer_range=0.5)
+    return GeneralQuantumSolver(dimension=64, tokenizer=FakeTokenizer(vocab_size=512),
+                                model=LlamaForCausalLM(config).eval())
+
+
+def _next_token_logits(solver, prompts):
+    """Logits for each prompt's next token, fed to the model as _generate_batch feeds it."""
+    input_ids, attention_mask, past_key_values = solver._encode_prompts(prompts,
+                                                                        solver.system_prompt)
+    cached = 0 if past_key_values is None else past_key_values.get_seq_length()
+    position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+    with torch.no_grad():
+        outputs = solver.model(input_ids[:, cached:], attention_mask=attention_mask,
+                               position_ids=position_ids[:, cached:],
+                               past_key_values=past_key_values)
+    return outputs.logits[:, -1]
+
+
+def test_prefix_cache_generation_matches_uncached_generation():
+    solver = _tiny_llama_solver()
+    prompts = [f"{solver.system_prompt}\n\nProblem to solve:\n{problem}"
+               for problem in PROBLEMS[:2]]
+
+    def generate(use_prefix_cache):
+        solver.use_prefix_cache = use_prefix_cache
+        torch.manual_seed(1)
+        return solver._generate_batch(prompts, 0.7, 8, solver.system_prompt)
+
+    solver.use_prefix_cache = False
+    uncached_logits = _next_token_logits(solver, prompts)
+    uncached = generate(False)
+    assert len(solver._prefix_caches) == 0
+
+    solver.use_prefix_cache = True
+    torch.testing.assert_close(_next_token_logits(solver, prompts), uncached_logits,
+                               atol=1e-4, rtol=1e-4)
+    assert len(solver._prefix_caches) == 1
+    assert generate(True) == uncached
+
+
+def test_prefix_caches_are_bounded_least_recently_used_first():
+    solver = make_fake_solver(dimension=64)
+    solver.max_prefix_caches = 2
+    for system_prompt in ["first", "second", "first", "third"]:
+        solver._generate_batch([f"{system_prompt} prompt"], 0.7, 8, system_prompt)
+    assert list(solver._prefix_caches) == ["first", "third"]
+
+
+def test_converged_steps_are_frozen_and_end_the_loop():
+    solver = make_fake_solver(dimension=64)
+    solver.stability_window = 10  # keep the whole-solution exits out of the way
+    solver.max_iterations = 20
+    session = _session_after_initial(solver)
+
+    def reflect(step_two):
+        completions = ["x = 1" if prompt.rstrip().endswith("Step 1:") else step_two
+                       for prompt in session.pending]
+        session.advance([GenerationResult(text, 1, 1) for text in completions])
+        return session.drain_events()
+
+    # Step 1 comes back unchanged, so it freezes once its fidelity window is full
+    for iteration in range(solver.step_convergence_window):
+        assert len(session.pending) == 2
+        events = reflect(f"y = {iteration} + {iteration * iteration}")
+    assert [event.step_number for event in events if isinstance(event, StepConvergedEvent)] == [1]
+    assert session.step_convergence.converged == [True, False]
+    assert len(session.pending) == 1 and session.pending[0].rstrip().endswith("Step 2:")
+
+    # Once step 2 settles as well, the loop stops without waiting for max_iterations
+    events = []
+    while not session.done:
+        events.extend(reflect("y = 2"))
+    converged = [event for event in events if isinstance(event, ConvergedEvent)]
+    assert [event.reason for event in converged] == ['steps_converged']
+    assert session.step_convergence.converged == [True, True]
+    assert session.iteration < solver.max_iterations
+    assert session.result()['converged_steps'] == [1, 2]
@@ -0,0 +1,126 @@
+"""
+Logging and tracing for the quantum reflection solvers.
+
+Modules log through loggers under the ``quantum_reflection`` namespace: progress milestones
+(iterations, stability checks, convergence, final results) at INFO, and full prompts,
+responses and steps at DEBUG. Messages use lazy %-style arguments and costly values are
+only computed behind ``isEnabledFor`` checks, so at the default WARNING level logging costs
+no more than a level check per call.
+
+Tracing is separate: when a trace file is configured every solver event is appended to it
+as one JSON object per line, with a wall-clock timestamp and, for timed spans, a duration.
+With no trace file configured ``trace`` and ``span`` return immediately.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, TextIO, Union
+
+LOGGER_NAME = "quantum_reflection"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_handler: Optional[logging.Handler] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return the logger for one module, e.g. ``get_logger("general")``."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def configure_logging(level: Union[int, str, None] = None, stream: Optional[TextIO] = None) -> None:
+    """
+    Attach a stderr handler to the package logger and set its level.
+
+    Args:
+        level: Logging level; defaults to the QUANTUM_LOG_LEVEL environment variable, else INFO
+        stream: Stream to log to (default stderr)
+    """
+    global _handler
+    if level is None:
+        level = os.environ.get("QUANTUM_LOG_LEVEL", "INFO")
+    if isinstance(level, str):
+        level = level.upper()
+    logger = logging.getLogger(LOGGER_NAME)
+    if _handler is not None:
+        logger.removeHandler(_handler)
+    _handler = logging.StreamHandler(stream or sys.stderr)
+    _handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(_handler)
+    logger.setLevel(level)
+
+
+def _json_default(value: Any) -> Any:
+    # NumPy scalars and arrays, and anything else, as the closest JSON value
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class TraceWriter:
+    """Appends trace events to a JSONL file; the file is opened on the first event."""
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self._file: Optional[TextIO] = None
+        self._lock = threading.Lock()
+
+    def record(self, event: str, **fields) -> None:
+        line = json.dumps({'ts': time.time(), 'event': event, **fields}, default=_json_default)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_tracer: Optional[TraceWriter] = (
+    TraceWriter(os.environ["QUANTUM_TRACE_FILE"]) if os.environ.get("QUANTUM_TRACE_FILE") else None
+)
+
+
+def configure_tracing(path: Optional[str] = None) -> None:
+    """Write trace events to ``path`` (JSONL), or disable tracing when ``path`` is None."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = TraceWriter(path) if path else None
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def trace(event: str, **fields) -> None:
+    """Record one trace event if tracing is enabled."""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.record(event, **fields)
+
+
+@contextmanager
+def span(event: str, **fields) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block and record it as one trace event with a ``duration_s`` field.
+
+    Yields the event's field dict so the block can add fields it only knows at the end
+    (e.g. token counts).
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield fields
+        return
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        tracer.record(event, duration_s=time.perf_counter() - start, **fields)